@@ -1,19 +1,40 @@
 import os
 import eventlet
 eventlet.monkey_patch()
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente antes dos módulos do app: vários leem a configuração
+# (os.getenv) na importação
+load_dotenv(dotenv_path=".env.local")
+
+from eventlet import tpool
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
-from dotenv import load_dotenv
-from deepgram import DeepgramClient, PrerecordedOptions, FileSource
 import base64
+import re
 from io import BytesIO
 
-import requests
+import http_client
+from clients import openai_client, deepgram_client
 import logging
 from functools import wraps
 import json
-from functions_actions import websearch
-from openai import OpenAI
+import uuid
+from functions_actions import websearch, search_cache, search_orchestrator
+from tool_registry import tools
+from session_store import create_session_store
+from context_window import ContextManager
+from image_store import ImageStore, create_image_tier, image_ref_message, last_image_hash
+from frame_pipeline import FrameCache, decode_frame, dhash, normalize_image
+from frame_archive import FrameArchiver
+from speech_stream import SpeechStream
+from speech_to_text import LiveTranscription, create_stt
+from turn_graph import TurnGraph
+from turn_scheduler import TurnScheduler, TurnCancelled, ServerBusy
+from upstream_scheduler import scheduler as upstream_scheduler, priority, TTS, BACKGROUND
+from intent_router import lexicon, route_intent, wants_image, VISION, SEARCH
+from tts_cache import TTSCache, DiskTier
+from metrics import registry, CALL_SECONDS, PAYLOAD_BYTES, TURNS, messages_size, record_usage, record_turn, turn_timings
 
 from flask_socketio import SocketIO, emit
 
@@ -21,53 +42,159 @@ from flask_socketio import SocketIO, emit
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Carrega variáveis de ambiente
-load_dotenv(dotenv_path=".env.local")
-
 # Configurações das APIs
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Endereços das APIs (trocados por servidores locais nos testes de carga, ver benchmarks/)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+DEEPGRAM_BASE_URL = os.getenv("DEEPGRAM_BASE_URL", "https://api.deepgram.com").rstrip("/")
+
+# Envia ao cliente os tempos de cada rodada no evento 'timings' (o cliente também pode
+# pedir por requisição, com timings: true)
+TIMINGS_EVENT = os.getenv("TIMINGS_EVENT", "0") == "1"
 
-# Inicializa Deepgram
-deepgram = DeepgramClient(DEEPGRAM_API_KEY)
+# Fila de mensagens do Socket.IO (ex.: redis://...) para vários processos (ver serve.py):
+# um evento emitido em qualquer processo chega ao cliente conectado a outro
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE") or None
 
-# Inicializa OpenAI
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Os clientes da Deepgram e da OpenAI são criados no primeiro uso (clients.py)
 
 # Inicializa Flask
 app = Flask(__name__)
 CORS(app)  # Permite requisições de outros domínios (para desenvolvimento)
 
 # Inicializa SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
-
-# Contexto do Chat
-chat_context = [
-    {
-        "role": "system",
-        "content": (
-            "Seu nome é Alloy. Você é um bot engraçado e espirituoso, que consegue ver imagens, consegue identificar objetos em imagens, ver câmera, ler textos em imagens e trabalhar com todo tipo de imagem. Sua interface com os usuários inclui capacidades de voz e visão. "
-            "Sempre que um usuário pedir para 'ver', 'usar a câmera', 'olhar para', 'analisar', 'ler' algo visualmente, ou qualquer coisa que exija percepção visual, você deve utilizar suas capacidades de visão. Sim, você pode usar a câmera quando necessário. "
-            "Responda com respostas curtas e concisas. Evite usar pontuação inpronunciável ou emojis."
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=SOCKETIO_MESSAGE_QUEUE)
+
+# Prompt de sistema, enviado no início de todas as conversas
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": (
+        "Seu nome é Alloy. Você é um bot engraçado e espirituoso, que consegue ver imagens, consegue identificar objetos em imagens, ver câmera, ler textos em imagens e trabalhar com todo tipo de imagem. Sua interface com os usuários inclui capacidades de voz e visão. "
+        "Sempre que um usuário pedir para 'ver', 'usar a câmera', 'olhar para', 'analisar', 'ler' algo visualmente, ou qualquer coisa que exija percepção visual, você deve utilizar suas capacidades de visão. Sim, você pode usar a câmera quando necessário. "
+        "Responda com respostas curtas e concisas. Evite usar pontuação inpronunciável ou emojis."
+    )
+}
+
+# Contexto do Chat por conversa (ver conversation_key)
+session_store = create_session_store()
+
+# O navegador manda um identificador da conversa ao conectar (auth): o estado é guardado por
+# ele, e não pelo request.sid, que muda a cada reconexão. Com as sessões no Redis, qualquer
+# processo retoma a conversa. Sem identificador, vale o request.sid
+CONVERSATION_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+conversations = {}  # request.sid -> chave da conversa
+
+def conversation_key(sid):
+    return conversations.get(sid, sid)
+
+# Uma rodada ativa por conversa (duas abas com a mesma conversa não gravam o histórico ao
+# mesmo tempo) e um limite de rodadas simultâneas no servidor
+turn_scheduler = TurnScheduler()
+
+# Resume as mensagens que saíram da janela de contexto (executado em segundo plano)
+def summarize_context(previous_summary, transcript):
+    # Sem pressa: passa depois das chamadas das rodadas quando o limite da conta aperta
+    with CALL_SECONDS.time(call="summary"), priority(BACKGROUND):
+        response = openai_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Resuma a conversa a seguir em poucas frases, mantendo fatos, nomes e preferências do usuário. Integre o resumo anterior, se houver."
+                },
+                {
+                    "role": "user",
+                    "content": f"Resumo anterior: {previous_summary or '(nenhum)'}\n\nConversa:\n{transcript}"
+                }
+            ]
         )
-    }
+    record_usage("summary", response.usage)
+    return response.choices[0].message.content
+
+context = ContextManager(SYSTEM_MESSAGE, summarize_context, session_store)
+
+# Legenda curta para as imagens antigas, que deixam de ser enviadas inteiras
+def caption_image(data_url):
+    with CALL_SECONDS.time(call="caption"), priority(BACKGROUND):
+        response = openai_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": "Descreva esta imagem em uma frase curta, citando objetos e textos visíveis."},
+                        {"type": "image_url", "image_url": {"url": data_url, "detail": "low"}},
+                    ],
+                }
+            ]
+        )
+    record_usage("caption", response.usage)
+    return response.choices[0].message.content
+
+image_store = ImageStore(caption_fn=caption_image, shared=create_image_tier())
+
+# Arquivamento opcional dos frames em disco (FRAME_ARCHIVE_DIR)
+frame_archiver = FrameArchiver()
+
+# Frames recentes de cada sessão, para reconhecer a mesma cena sem reprocessar
+frame_cache = FrameCache()
+
+# Normaliza o frame e guarda no armazenamento de imagens; frames quase idênticos
+# a um recente da mesma sessão reaproveitam a imagem (e a legenda) já existentes.
+# Só o trabalho do OpenCV (que libera o GIL) vai para as threads nativas do tpool: lá
+# não se pode tocar em locks das green threads (armazenamentos, caches, logging)
+def prepare_frame(sid, video_bytes, encoded=None):
+    image = tpool.execute(decode_frame, video_bytes)
+    fingerprint = tpool.execute(dhash, image)
+    image_hash = frame_cache.lookup(sid, fingerprint)
+    if image_hash and image_hash in image_store:
+        logger.info(f"Frame repetido reconhecido: {image_hash[:12]}")
+        return image_hash, False
+
+    normalized, (width, height) = tpool.execute(normalize_image, image, video_bytes)
+    logger.info(f"Frame normalizado: {width}x{height}, {len(normalized)} bytes")
+    # Se o frame não precisou ser alterado, reaproveita o base64 original do navegador
+    image_hash = image_store.put(normalized, encoded if normalized is video_bytes else None)
+    frame_cache.add(sid, fingerprint, image_hash)
+    return image_hash, True
+
+# Etapa "frame" da rodada: prepara o frame e, se for novo, arquiva em disco
+def process_frame(sid, video_bytes, video_encoded=None):
+    image_hash, is_new = prepare_frame(sid, video_bytes, video_encoded)
+    if is_new:
+        frame_archiver.archive(sid, image_hash, image_store.get(image_hash))
+    return image_hash
+
+# Monta as mensagens da requisição: janela de contexto com as imagens resolvidas
+def build_messages(key, state):
+    return image_store.resolve(context.build_messages(key, state))
+
+TTS_MODEL = "tts-1"
+TTS_VOICE = "alloy"
+
+# Frases frequentes, sintetizadas na inicialização para já estarem no cache
+TTS_PREWARM_PHRASES = [
+    "Não foi possível processar a solicitação.",
+    "Olá! Como posso ajudar?",
+    "Desculpe, não entendi. Pode repetir?",
 ]
 
 # Função para sintetizar texto em áudio usando a API de TTS da OpenAI
-def text_to_speech(text):
-    url = "https://api.openai.com/v1/audio/speech"
+def synthesize_speech(text):
+    url = f"{OPENAI_BASE_URL}/audio/speech"
     headers = {
         "Authorization": f"Bearer {OPENAI_API_KEY}",
         "Content-Type": "application/json"
     }
     data = {
-        "model": "tts-1",
-        "voice": "alloy",
+        "model": TTS_MODEL,
+        "voice": TTS_VOICE,
         "input": text
     }
 
     try:
-        response = requests.post(url, headers=headers, json=data, stream=True)
+        response = http_client.post(url, headers=headers, json=data, stream=True)
         if response.status_code != 200:
             logger.error(f"Erro na API de TTS: {response.text}")
             return None
@@ -85,33 +212,110 @@ def text_to_speech(text):
         logger.error(f"Erro ao chamar a API de TTS: {e}")
         return None
 
-# Função para transcrever áudio usando DeepgramClient
+# Cache do áudio sintetizado: frases repetidas não voltam à API de TTS
+tts_cache = TTSCache(synthesize_speech, TTS_MODEL, TTS_VOICE, disk=DiskTier())
+
+# O áudio é o que o usuário está esperando ouvir: tem a maior prioridade no limite da conta
+def text_to_speech(text):
+    with CALL_SECONDS.time(call="tts"), priority(TTS):
+        audio = tts_cache.text_to_speech(text)
+    if audio:
+        PAYLOAD_BYTES.observe(len(audio), kind="audio_out")
+    return audio
+
+# Função para transcrever áudio com a API REST do Deepgram (pré-gravado), pelo pool HTTP
+# compartilhado: o SDK abre um cliente novo a cada chamada
 def transcribe_audio(audio_bytes, mimetype='audio/wav', language='pt-BR'):
     try:
-        # Configurações para a transcrição
-        options = PrerecordedOptions(
-            model="nova-2",
-            smart_format=True,
-            language=language
-        )
-
-        # Cria o payload
-        payload: FileSource = {
-            "buffer": audio_bytes,
-            "mimetype": mimetype
-        }
-
-        # Chama o método de transcrição
-        response = deepgram.listen.prerecorded.v("1").transcribe_file(payload, options)
+        with CALL_SECONDS.time(call="transcribe"):
+            response = http_client.post(
+                f"{DEEPGRAM_BASE_URL}/v1/listen",
+                params={
+                    "model": "nova-2",
+                    "smart_format": "true",
+                    "language": language
+                },
+                headers={
+                    "Authorization": f"Token {DEEPGRAM_API_KEY}",
+                    "Content-Type": mimetype
+                },
+                data=audio_bytes
+            )
+        response.raise_for_status()
 
         # Extrai o transcript
-        transcript = response['results']['channels'][0]['alternatives'][0]['transcript']
+        transcript = response.json()['results']['channels'][0]['alternatives'][0]['transcript']
         return transcript
 
     except Exception as e:
         logger.error(f"Erro na transcrição com Deepgram: {e}")
         return None
 
+# A câmera é tratada no process_turn (anexa o frame atual à conversa); o registro só
+# declara a função para o ChatGPT
+@tools.tool("Use esta função quando o usuário solicitar alguma coisa visual.",
+            action="Ação solicitada pelo usuário relacionada ao uso da câmera.")
+def use_camera(action):
+    return None
+
+# Chama o ChatGPT e devolve a mensagem do assistente como dicionário. Com `speech`,
+# a resposta vem em streaming e o texto é repassado para a síntese de voz frase a frase.
+# As funções vão em toda chamada, na mesma ordem e com os mesmos bytes, assim como o prompt
+# de sistema no início das mensagens: o prefixo igual aproveita o cache de prompt da OpenAI.
+# Quando não devem ser usadas, `use_tools=False` só troca o tool_choice
+def chat_completion(messages, speech=None, use_tools=True, call="chat"):
+    kwargs = {"model": "gpt-4o-mini", "messages": messages}
+    if tools.schemas():
+        kwargs["tools"] = tools.schemas()
+        kwargs["tool_choice"] = "auto" if use_tools else "none"
+    PAYLOAD_BYTES.observe(messages_size(messages), kind=call)
+
+    with CALL_SECONDS.time(call=call):
+        if speech is None:
+            response = openai_client().chat.completions.create(**kwargs)
+            record_usage(call, response.usage)
+            return response.choices[0].message.model_dump(exclude_none=True)
+        return _stream_completion(kwargs, speech, call)
+
+def _stream_completion(kwargs, speech, call):
+    content = []
+    tool_calls = {}
+    stream = openai_client().chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs)
+    try:
+        # O uso de tokens vem num último pedaço, sem choices
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                record_usage(call, chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                speech.add_text(delta.content)
+            # As chamadas de função chegam em pedaços, agrupados pelo índice
+            for tool_delta in delta.tool_calls or []:
+                tool_call = tool_calls.setdefault(tool_delta.index, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                })
+                if tool_delta.id:
+                    tool_call["id"] = tool_delta.id
+                if tool_delta.function:
+                    tool_call["function"]["name"] += tool_delta.function.name or ""
+                    tool_call["function"]["arguments"] += tool_delta.function.arguments or ""
+    finally:
+        # Rodada cancelada no meio da resposta: fecha a conexão em vez de ler o resto
+        stream.close()
+
+    message = {"role": "assistant", "content": "".join(content) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    return message
+
+# Transcrição em tempo real (STT_BACKEND=buffered usa o transcribe_audio no final)
+stt = create_stt(deepgram_client, transcribe_audio)
+
 # Decorador para tratar erros
 def handle_errors(f):
     @wraps(f)
@@ -123,6 +327,62 @@ def handle_errors(f):
             emit("error", {"error": "Ocorreu um erro no servidor."})
     return decorated_function
 
+# Coletores: contadores que os caches, o pool HTTP e o orquestrador de busca já mantêm
+@registry.collector
+def collect_caches():
+    return [
+        ("aivision_tts_cache_total", "counter", "Consultas ao cache de TTS.",
+         [({"result": "hit"}, tts_cache.hits), ({"result": "miss"}, tts_cache.misses)]),
+        ("aivision_search_cache_total", "counter", "Consultas ao cache de busca.",
+         [({"result": "hit"}, search_cache.hits), ({"result": "miss"}, search_cache.misses),
+          ({"result": "coalesced"}, search_cache.coalesced)]),
+    ]
+
+@registry.collector
+def collect_http_pool():
+    stats = http_client.pool_stats()
+    return [
+        (f"aivision_http_{key}_total", "counter", f"Pool HTTP por host: {key}.",
+         [({"host": host}, counts[key]) for host, counts in stats.items()])
+        for key in ("requests", "new_connections", "reused_connections")
+    ]
+
+@registry.collector
+def collect_search_backends():
+    report = search_orchestrator.report()
+    return [
+        ("aivision_search_backend_latency_seconds", "gauge", "Latência média móvel de cada backend de busca.",
+         [({"backend": name}, stats["latency"]) for name, stats in report.items()]),
+        ("aivision_search_backend_error_rate", "gauge", "Taxa de erro média móvel de cada backend de busca.",
+         [({"backend": name}, stats["error_rate"]) for name, stats in report.items()]),
+        ("aivision_search_backend_calls_total", "counter", "Buscas enviadas a cada backend.",
+         [({"backend": name}, stats["calls"]) for name, stats in report.items()]),
+    ]
+
+@registry.collector
+def collect_turns():
+    return [
+        ("aivision_turns_active", "gauge", "Rodadas em andamento.", [({}, turn_scheduler.active)]),
+        ("aivision_turns_queued", "gauge", "Rodadas esperando uma vaga.", [({}, turn_scheduler.queued)]),
+    ]
+
+@registry.collector
+def collect_upstreams():
+    report = upstream_scheduler.report()
+    return [
+        ("aivision_upstream_remaining_requests", "gauge", "Requisições disponíveis no limite de cada API/modelo.",
+         [({"upstream": name}, stats["requests"]) for name, stats in report.items()]),
+        ("aivision_upstream_remaining_tokens", "gauge", "Tokens disponíveis no limite de cada API/modelo.",
+         [({"upstream": name}, stats["tokens"]) for name, stats in report.items()]),
+        ("aivision_upstream_waiting", "gauge", "Chamadas esperando orçamento em cada API/modelo.",
+         [({"upstream": name}, stats["waiting"]) for name, stats in report.items()]),
+    ]
+
+# Métricas no formato do Prometheus
+@app.route('/metrics')
+def metrics():
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
 # Rota para servir a página principal
 @app.route('/')
 @handle_errors
@@ -131,194 +391,369 @@ def index():
 
 # Evento para conexão de clientes
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
+    conversation = auth.get("conversation") if isinstance(auth, dict) else None
+    if isinstance(conversation, str) and CONVERSATION_ID.match(conversation):
+        conversations[request.sid] = f"conversation:{conversation}"
     logger.info(f"Cliente conectado: {request.sid}")
 
 # Evento para desconexão de clientes
 @socketio.on('disconnect')
 def handle_disconnect():
+    # A rodada em andamento não tem mais quem a escute
+    turn_scheduler.cancel(conversation_key(request.sid), owner=request.sid)
+    # Conversa com identificador fica guardada até expirar, para a reconexão continuar dela
+    if conversations.pop(request.sid, None) is None:
+        context.delete(request.sid)
+    frame_cache.drop_session(request.sid)
+    live = live_transcriptions.pop(request.sid, None)
+    if live:
+        live.abort()
     logger.info(f"Cliente desconectado: {request.sid}")
 
-# Evento para processar dados enviados pelo cliente
+# Evento para processar dados enviados pelo cliente (áudio e imagem como data URL base64)
 @socketio.on('process_data')
 @handle_errors
 def handle_process_data(data):
-    global chat_context
-    use_image = False
-
-    if 'video' in data:
-        video_data = data['video']
-        try:
+    video_bytes = video_encoded = audio_bytes = None
+    try:
+        if 'video' in data:
             # Decodifica a imagem base64
-            header, encoded = video_data.split(',', 1)
-            video_bytes = base64.b64decode(encoded)
-            with open('captured_images/captured_image.jpg', 'wb') as f:
-                f.write(video_bytes)
-            logger.info("Imagem salva direto do navegador.")
-            use_image = True
-        except Exception as e:
-            logger.error(f"Erro ao salvar a imagem: {e}")
-            emit("error", {"error": "Erro ao processar a imagem."})
-            return
-
-    if 'audio' in data:
-        audio_data = data['audio']
-        try:
+            header, video_encoded = data['video'].split(',', 1)
+            video_bytes = base64.b64decode(video_encoded)
+        if 'audio' in data:
             # Decodifica o áudio base64
-            header, encoded = audio_data.split(',', 1)
+            header, encoded = data['audio'].split(',', 1)
             audio_bytes = base64.b64decode(encoded)
-            # Transcreve o áudio usando Deepgram
-            transcript = transcribe_audio(audio_bytes, mimetype='audio/wav', language='pt-BR')
+    except Exception as e:
+        logger.error(f"Erro ao decodificar os dados recebidos: {e}")
+        emit("error", {"error": "Erro ao processar os dados recebidos."})
+        return
+
+    process_turn(
+        request.sid,
+        text=data.get('text'),
+        audio_bytes=audio_bytes,
+        video_bytes=video_bytes,
+        video_encoded=video_encoded,
+        stream=bool(data.get('stream')),
+        timings=bool(data.get('timings')),
+    )
+
+# Evento para processar dados binários: áudio e imagem chegam como bytes, sem base64
+@socketio.on('process_data_bin')
+@handle_errors
+def handle_process_data_bin(data):
+    process_turn(
+        request.sid,
+        text=data.get('text'),
+        audio_bytes=data.get('audio'),
+        audio_mimetype=data.get('audio_mimetype') or 'audio/wav',
+        video_bytes=data.get('video'),
+        binary=True,
+        stream=bool(data.get('stream')),
+        timings=bool(data.get('timings')),
+    )
+
+# Transcrição em tempo real: o cliente abre a sessão, envia trechos enquanto grava
+# e, ao parar, manda o frame e a contagem de trechos em 'audio_end'
+live_transcriptions = {}
+
+@socketio.on('audio_start')
+@handle_errors
+def handle_audio_start(data):
+    sid = request.sid
+    previous = live_transcriptions.pop(sid, None)
+    if previous:
+        previous.abort()
+    # Registra antes de abrir o backend: os trechos que chegarem durante a abertura (cada
+    # evento roda na sua green thread) ficam guardados em vez de serem descartados
+    live = LiveTranscription()
+    live_transcriptions[sid] = live
+    try:
+        session = stt.open(mimetype=data.get('mimetype') or 'audio/webm', language='pt-BR')
+    except Exception:
+        live.abort()
+        if live_transcriptions.get(sid) is live:
+            del live_transcriptions[sid]
+        raise
+    live.attach(session)
+    logger.info(f"Transcrição em tempo real iniciada: {sid}")
+
+@socketio.on('audio_chunk')
+@handle_errors
+def handle_audio_chunk(data):
+    live = live_transcriptions.get(request.sid)
+    if live is None:
+        return
+    live.add_chunk(data['seq'], data['audio'])
+
+@socketio.on('audio_end')
+@handle_errors
+def handle_audio_end(data):
+    sid = request.sid
+    live = live_transcriptions.pop(sid, None)
+    if live is None:
+        emit("error", {"error": "Nenhuma gravação em andamento."})
+        return
+    try:
+        transcript = live.finish(data.get('chunks', 0))
+    except Exception as e:
+        logger.error(f"Erro na transcrição em tempo real: {e}")
+        transcript = None
+    if not transcript:
+        logger.error("Erro na transcrição de áudio.")
+        emit("error", {"error": "Erro na transcrição de áudio"})
+        return
+
+    process_turn(
+        sid,
+        transcript=transcript,
+        video_bytes=data.get('video'),
+        binary=True,
+        stream=bool(data.get('stream')),
+        timings=bool(data.get('timings')),
+    )
+
+# Os eventos com áudio vão direto ao cliente quando ele está conectado a este processo (o caso
+# normal, com sessões fixas no balanceador): o áudio não passa pela fila que todos os processos leem
+def emit_to_client(sid, event, data):
+    local = socketio.server.manager.is_connected(sid, "/")
+    socketio.emit(event, data, to=sid, ignore_queue=local)
+
+# A imagem fica no armazenamento; o histórico guarda só a referência.
+# Se a cena não mudou desde a última imagem enviada (a da janela de contexto, não a de
+# qualquer ponto do histórico), o modelo já a tem na requisição
+def attach_frame(state, image_hash):
+    if last_image_hash(context.window(state)) == image_hash:
+        logger.info("Frame inalterado: reaproveitando a imagem já enviada.")
+    else:
+        context.append(state, image_ref_message(image_hash))
+        image_store.publish(image_hash)
+        logger.info("Imagem incluída no chat.")
+
+# Registra no histórico uma chamada de função feita sem passar pelo ChatGPT, no mesmo
+# formato que ele usaria (chamada do assistente seguida do resultado)
+def append_tool_result(state, name, arguments, result):
+    call_id = f"call_local_{uuid.uuid4().hex[:12]}"
+    context.append(state, {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{
+            "id": call_id,
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)},
+        }],
+    })
+    context.append(state, {
+        "role": "tool",
+        "tool_call_id": call_id,
+        "content": result or "Nenhum resultado encontrado.",
+    })
+
+# Executa uma rodada e registra os tempos de cada etapa nas métricas (e no evento
+# 'timings', se pedido). Uma mensagem nova da mesma sessão cancela a rodada em andamento;
+# sem vaga no servidor, o cliente recebe 'busy' em vez de esperar
+def process_turn(sid, text=None, audio_bytes=None, audio_mimetype='audio/wav', transcript=None,
+                 video_bytes=None, video_encoded=None, binary=False, stream=False, timings=False):
+    graph = TurnGraph()
+    if audio_bytes:
+        PAYLOAD_BYTES.observe(len(audio_bytes), kind="audio_in")
+    if video_bytes:
+        PAYLOAD_BYTES.observe(len(video_bytes), kind="video_in")
+    outcome = "error"
+    try:
+        with turn_scheduler.turn(conversation_key(sid), owner=sid):
+            try:
+                outcome = run_turn(sid, graph, text, audio_bytes, audio_mimetype, transcript, video_bytes,
+                                   video_encoded, binary, stream)
+            except TurnCancelled:
+                # Para as etapas e a síntese ainda em andamento antes de a rodada nova começar;
+                # 'cancelled' chega ao cliente depois de todos os trechos já enviados desta rodada
+                graph.cancel()
+                emit("cancelled", {})
+                raise
+    except ServerBusy:
+        outcome = "busy"
+        logger.warning(f"Servidor ocupado: rodada de {sid} recusada.")
+        emit("busy", {"error": "Servidor ocupado, tente novamente em instantes."})
+    except TurnCancelled:
+        outcome = "cancelled"
+        logger.info(f"Rodada de {sid} cancelada (mensagem mais nova ou desconexão).")
+    finally:
+        TURNS.inc(outcome=outcome)
+        if outcome in ("done", "error"):
+            record_turn(graph)
+            logger.info(f"Tempos da rodada: {graph.summary()}")
+            if timings or TIMINGS_EVENT:
+                emit("timings", turn_timings(graph))
+
+# Rodada da conversa: imagem, transcrição, ChatGPT e síntese de voz. Devolve o resultado
+# para as métricas: "done", ou "error" quando o cliente recebeu um erro
+def run_turn(sid, graph, text, audio_bytes, audio_mimetype, transcript, video_bytes, video_encoded, binary, stream):
+    key = conversation_key(sid)
+    state = context.load(key)
+    user_text = None
+
+    # Etapas independentes começam juntas: o frame é processado (e já codificado em base64,
+    # para o caso de o ChatGPT pedir a câmera) enquanto o áudio é transcrito
+    if audio_bytes and not transcript:
+        graph.add("transcribe", lambda: transcribe_audio(audio_bytes, mimetype=audio_mimetype, language='pt-BR'))
+    if video_bytes:
+        # O OpenCV roda em threads nativas (ver prepare_frame) sem travar as green threads
+        graph.add("frame", lambda: process_frame(sid, video_bytes, video_encoded))
+        graph.add("frame_encode", lambda frame: image_store.data_url(frame), deps=["frame"])
+    input_stages = ["transcribe"] if graph.has("transcribe") else []
+
+    if audio_bytes or transcript:
+        try:
+            # Transcreve o áudio usando Deepgram (a não ser que já tenha vindo em tempo real)
+            if graph.has("transcribe"):
+                transcript = graph.result("transcribe")
             if not transcript:
                 logger.error("Erro na transcrição de áudio.")
                 emit("error", {"error": "Erro na transcrição de áudio"})
-                return
+                return "error"
             logger.info(f"Texto transcrito: {transcript}")
 
-            chat_context.append({"role": "user", "content": transcript})
-
-            # Verifica palavras-chave para utilizar a visão
-            keywords = ["ver", "olhar", "foto", "câmera", "imagem", "cam", "ler", "visão", "cena", "picture"]
-            use_image = any(keyword in transcript.lower() for keyword in keywords)
+            context.append(state, {"role": "user", "content": transcript})
+            user_text = transcript
 
         except Exception as e:
             logger.error(f"Erro ao processar áudio: {e}")
             emit("error", {"error": "Erro ao processar áudio."})
-            return
+            return "error"
 
-    elif 'text' in data:
-        text = data['text']
+    elif text:
         logger.info(f"Texto recebido: {text}")
-        chat_context.append({"role": "user", "content": text})
-
-        # Verifica palavras-chave para utilizar a visão
-        keywords = ["ver", "olhar", "foto", "câmera", "imagem", "cam", "ler", "visão", "cena", "picture"]
-        use_image = any(keyword in text.lower() for keyword in keywords)
+        context.append(state, {"role": "user", "content": text})
+        user_text = text
 
     else:
         logger.warning("Requisição inválida: nem áudio, nem texto.")
         emit("error", {"error": "Requisição inválida."})
-        return
-
-    # Define as funções que o ChatGPT pode chamar
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "websearch",
-                "description": "Use esta função para responder perguntas que requerem informações atualizadas da internet, como eventos recentes, agendas de eventos e informações sobre o dia atual ou datas futuras.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "Consulta para buscar na web, ex.: quem ganhou o US Open este ano?, noticias hoje?, me atualize de determinado assunto, quais os próximos shows do artista X?"
-                        },
-                    },
-                    "required": ["query"],
-                    "additionalProperties": False,
-                },
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "use_camera",
-                "description": "Use esta função quando o usuário solicitar alguma coisa visual.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "action": {
-                            "type": "string",
-                            "description": "Ação solicitada pelo usuário relacionada ao uso da câmera."
-                        },
-                    },
-                    "required": ["action"],
-                    "additionalProperties": False,
-                },
-            }
-        }
-    ]
+        return "error"
+
+    # No modo streaming cada frase da resposta é sintetizada e enviada assim que fica pronta
+    speech = None
+    if stream:
+        def emit_chunk(seq, sentence, audio):
+            if audio is not None and not binary:
+                audio = base64.b64encode(audio).decode('utf-8')
+            emit_to_client(sid, "response_chunk", {"seq": seq, "text": sentence, "audio": audio})
+        speech = SpeechStream(text_to_speech, emit_chunk)
+        graph.on_cancel(speech.abort)
+
+    # Verifica as palavras-chave de visão e de busca (léxico compilado, ver intent_lexicon.py)
+    matched = lexicon.match(user_text)
+    use_image = wants_image(user_text, matched)
+
+    # Intenção clara: a ferramenta roda aqui e o ChatGPT é chamado uma vez só, sem funções
+    intent = route_intent(user_text, matched)
+    fast_path = None
+    try:
+        if intent == VISION and use_image and graph.has("frame"):
+            with graph.stage("use_camera", deps=["frame_encode"]):
+                image_hash = graph.result("frame")
+                graph.result("frame_encode")
+            attach_frame(state, image_hash)
+            fast_path = "use_camera"
+        elif intent == SEARCH:
+            with graph.stage("websearch", deps=input_stages), CALL_SECONDS.time(call="websearch"):
+                function_response = websearch(query=user_text)
+            append_tool_result(state, "websearch", {"query": user_text}, function_response)
+            fast_path = "websearch"
+    except Exception as e:
+        # O caminho normal, com funções, ainda pode responder
+        logger.error(f"Erro no atalho de intenção ({intent}): {e}")
+        fast_path = None
+    if fast_path:
+        logger.info(f"Intenção '{intent}' resolvida localmente; uma única chamada ao ChatGPT.")
 
     # Chama a API do ChatGPT com funções
     try:
-        response_chat = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=chat_context,
-            tools=tools,
-            tool_choice="auto"
-        )
-        response_message = response_chat.choices[0].message
+        with graph.stage("chat", deps=[fast_path] if fast_path else input_stages):
+            response_message = chat_completion(build_messages(key, state), speech=speech,
+                                               use_tools=not fast_path)
+        last_stage = "chat"
 
         # Verifica se o GPT quer chamar uma função
-        if response_message.tool_calls:
+        if response_message.get("tool_calls"):
             reply = None
-            tool_call = response_message.tool_calls[0]
-            function_name = tool_call.function.name
-            function_args = json.loads(tool_call.function.arguments)
-
-            if function_name == "use_camera" and use_image:
-                reply = None
-                # Converte a imagem para base64
-                with open('captured_images/captured_image.jpg', 'rb') as img_file:
-                    encoded_image = base64.b64encode(img_file.read()).decode('utf-8')
-                chat_context.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{encoded_image}"
-                            },
-                        },
-                    ],
-                })
-                logger.info("Imagem incluída no chat.")
-
-            elif function_name == "websearch":
-                reply = None
-                function_response = websearch(query=function_args.get("query"))
-                chat_context.append(response_message)
-                chat_context.append({
-                    "role": "function",
-                    "name": function_name,
-                    "content": function_response,
-                })
-                logger.info("Internet Search used")
-
-            else:
-                reply = "Não foi possível processar a solicitação."
-                chat_context.append({"role": "assistant", "content": reply})
-                logger.warning(f"Função chamada não está disponível: {function_name}")
+            frames = []
+
+            # A câmera desta rodada: espera o frame (já processado em paralelo) e o anexa
+            # depois das respostas das funções
+            def use_camera_now(action):
+                if not (use_image and graph.has("frame")):
+                    return "A câmera não está disponível para este pedido."
+                frames.append(graph.result("frame"))
+                graph.result("frame_encode")
+                return "Imagem atual da câmera anexada à conversa."
+
+            # Todas as funções pedidas rodam juntas, cada uma com seu prazo
+            camera_called = any(call["function"]["name"] == "use_camera" for call in response_message["tool_calls"])
+            tool_deps = ["chat", "frame_encode"] if camera_called and graph.has("frame") else ["chat"]
+            with graph.stage("tools", deps=tool_deps):
+                tool_messages = tools.dispatch(response_message["tool_calls"], handlers={"use_camera": use_camera_now},
+                                               on_cancel=graph.on_cancel)
+            last_stage = "tools"
+            context.append(state, response_message)
+            for tool_message in tool_messages:
+                context.append(state, tool_message)
+            if frames:
+                attach_frame(state, frames[0])
 
             # Obtém a resposta final do ChatGPT após a função ser chamada
-            second_response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=chat_context
-            )
-            reply = second_response.choices[0].message.content if hasattr(second_response.choices[0].message, 'content') else 'Erro ao obter resposta do assistente.'
-            chat_context.append({"role": "assistant", "content": reply})
+            with graph.stage("chat_final", deps=[last_stage]):
+                second_message = chat_completion(build_messages(key, state), speech=speech, use_tools=False,
+                                                 call="chat_final")
+            last_stage = "chat_final"
+            reply = second_message.get("content")
+            context.append(state, {"role": "assistant", "content": reply})
             logger.info(f"Resposta do ChatGPT após chamada de função: {reply}")
 
         else:
-            reply = response_message.content if hasattr(response_message, 'content') else 'Erro ao obter resposta do assistente.'
-            chat_context.append({"role": "assistant", "content": reply})
+            reply = response_message.get("content")
+            context.append(state, {"role": "assistant", "content": reply})
             logger.info(f"Resposta do ChatGPT: {reply}")
 
     except Exception as e:
         logger.error(f"Erro ao chamar a API do ChatGPT: {e}")
+        if speech:
+            speech.abort()
         emit("error", {"error": "Erro ao gerar resposta com ChatGPT"})
-        return
+        return "error"
+    finally:
+        context.save(key, state)
+
+    if speech:
+        # Espera os últimos trechos de áudio e avisa o cliente que a resposta terminou
+        with graph.stage("tts", deps=[last_stage]):
+            chunks = speech.finish()
+        if not reply:
+            emit("error", {"error": "Nenhuma resposta gerada"})
+            return "error"
+        logger.info(f"Resposta enviada em {chunks} trechos de áudio.")
+        emit("response_end", {"text": reply, "chunks": chunks})
+        return "done"
 
     # Sintetiza a resposta em áudio usando a API de TTS da OpenAI
-    tts_audio = text_to_speech(reply) if reply else None
+    with graph.stage("tts", deps=[last_stage]):
+        tts_audio = text_to_speech(reply) if reply else None
     if not tts_audio:
         logger.error("Erro ao gerar áudio com a API de TTS.")
         emit("error", {"error": "Erro ao gerar áudio"})
-        return
+        return "error"
     elif not reply:
         emit("error", {"error": "Nenhuma resposta gerada"})
-        return
+        return "error"
+
+    # Cliente binário recebe o áudio em bytes; o antigo, em base64
+    if binary:
+        logger.info("Áudio sintetizado incluído na resposta.")
+        emit_to_client(sid, "response_bin", {"text": reply, "audio": tts_audio})
+        return "done"
 
     # Prepara a resposta
     response_data = {
@@ -331,10 +766,17 @@ def handle_process_data(data):
     logger.info("Áudio sintetizado incluído na resposta.")
 
     # Envia a resposta de volta ao cliente via WebSocket
-    emit("response", response_data)
+    emit_to_client(sid, "response", response_data)
+    return "done"
+
+# Os clientes são criados antes de aceitar conexões: carregar o SDK no meio de uma
+# rodada travaria todas as outras por alguns segundos
+def warm_up():
+    openai_client()
+    tts_cache.prewarm(TTS_PREWARM_PHRASES)
 
+# Modo de desenvolvimento: um processo, com debug. Em produção, vários processos: serve.py
 if __name__ == '__main__':
-    if not os.path.exists('captured_images'):
-        os.makedirs('captured_images')
+    warm_up()
     socketio.run(app, host='192.168.0.21', port=5000, debug=True, certfile='cert.pem', keyfile='key.pem')
     
\ No newline at end of file
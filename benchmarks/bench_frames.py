@@ -0,0 +1,53 @@
+#benchmark do pré-processamento de frames: bytes e milissegundos economizados por frame
+#uso: python benchmarks/bench_frames.py [imagens...] [--uplink-mbps 10] [--repeat 20]
+import os
+import sys
+import time
+import argparse
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from frame_pipeline import decode_frame, normalize_frame, estimate_image_tokens
+
+DEFAULT_IMAGE = os.path.join(os.path.dirname(__file__), "..", "captured_images", "captured_image.jpg")
+
+
+def browser_frames(path):
+    # Simula o que o navegador envia: frame na resolução da câmera com toDataURL('image/jpeg') (qualidade 0.92)
+    image = decode_frame(open(path, "rb").read())
+    frames = {os.path.basename(path): open(path, "rb").read()}
+    for width, height in [(1280, 720), (1920, 1080), (3840, 2160)]:
+        resized = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+        ok, encoded = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, 92])
+        frames[f"{width}x{height} q92"] = encoded.tobytes()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("images", nargs="*", default=[DEFAULT_IMAGE])
+    parser.add_argument("--uplink-mbps", type=float, default=10.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    bytes_per_ms = args.uplink_mbps * 1e6 / 8 / 1000
+    # O base64 do data URL aumenta o payload em 4/3
+    print(f"{'frame':<28}{'antes':>10}{'depois':>10}{'tokens':>14}{'proc ms':>10}{'upload ms':>12}{'ganho ms':>10}")
+    for path in args.images:
+        for name, frame in browser_frames(path).items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                normalized, (width, height) = normalize_frame(frame)
+            proc_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+            original = decode_frame(frame)
+            tokens_before = estimate_image_tokens(original.shape[1], original.shape[0])
+            tokens_after = estimate_image_tokens(width, height)
+            upload_saved_ms = (len(frame) - len(normalized)) * 4 / 3 / bytes_per_ms
+            print(f"{name:<28}{len(frame):>10}{len(normalized):>10}{tokens_before:>7}->{tokens_after:<6}"
+                  f"{proc_ms:>10.1f}{upload_saved_ms:>12.1f}{upload_saved_ms - proc_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#benchmark da detecção de intenção: compara a checagem antiga por substring com o léxico
+#compilado no corpus rotulado (falsos positivos de visão do atalho = imagens enviadas à toa)
+#uso: python benchmarks/bench_intent.py [corpus.tsv] [--repeat 200]
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from intent_router import route_intent, wants_image, VISION
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "intent_corpus.tsv")
+
+
+def legacy_use_image(text):
+    # A checagem que existia no app.py, montando a lista a cada chamada
+    keywords = ["ver", "olhar", "foto", "câmera", "imagem", "cam", "ler", "visão", "cena", "picture"]
+    return any(keyword in text.lower() for keyword in keywords)
+
+
+def load_corpus(path):
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                label, text = line.rstrip("\n").split("\t", 1)
+                samples.append((label, text))
+    return samples
+
+
+def confusion(samples, predict):
+    tp = fp = fn = 0
+    for label, text in samples:
+        predicted = predict(text)
+        expected = label == "vision"
+        tp += predicted and expected
+        fp += predicted and not expected
+        fn += expected and not predicted
+    return tp, fp, fn
+
+
+def per_call_us(samples, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, text in samples:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(samples)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    samples = load_corpus(args.corpus)
+    vision_total = sum(label == "vision" for label, _ in samples)
+    print(f"{len(samples)} frases, {vision_total} de visão")
+    print(f"{'checagem':<12}{'acertos':>9}{'falso +':>9}{'falso -':>9}{'µs/frase':>10}")
+    # "léxico" só libera a câmera (o ChatGPT decide); "atalho" anexa o frame sem perguntar a ele,
+    # então é o falso positivo do atalho que vira imagem enviada à toa
+    results = {}
+    checks = [("substring", legacy_use_image), ("léxico", wants_image),
+              ("atalho", lambda text: route_intent(text) == VISION)]
+    for name, fn in checks:
+        tp, fp, fn_count = confusion(samples, fn)
+        results[name] = fp
+        print(f"{name:<12}{tp:>9}{fp:>9}{fn_count:>9}{per_call_us(samples, fn, args.repeat):>10.2f}")
+    print(f"imagens enviadas à toa evitadas: {results['substring'] - results['atalho']}")
+
+    # Atalho de intenção: quantas frases dispensam a chamada com funções, e quantas vão para o lugar errado
+    routed = wrong = 0
+    for label, text in samples:
+        intent = route_intent(text)
+        if intent:
+            routed += 1
+            wrong += intent != label
+    print(f"atalho de intenção: {routed} frases resolvidas localmente, {wrong} na intenção errada")
+
+
+if __name__ == "__main__":
+    main()
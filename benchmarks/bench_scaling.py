@@ -0,0 +1,95 @@
+#escala horizontal: sobe o Redis local (mini_redis.py), as APIs falsas e o serve.py com 1, 2,
+#4... processos e mede a vazão (rodadas/s) com os clientes divididos entre as portas, como
+#faria um balanceador com sessões fixas. Todas as rodadas usam o Redis (sessões, imagens e
+#fila do Socket.IO), para só o número de processos mudar entre as medições
+#uso: python benchmarks/bench_scaling.py [--workers 1,2,4] [--clients 40] [--turns 5] [--stream]
+import os
+import sys
+import time
+import base64
+import argparse
+import tempfile
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.dirname(__file__))
+from fake_upstreams import add_arguments
+from load_test import ROOT, DEFAULT_IMAGE, SCENARIOS, start_fakes, app_env, wait_until_up, run_client, percentile
+
+
+def measure(args, workers, image, log):
+    redis_url = f"redis://127.0.0.1:{args.redis_port}/0"
+    mini_redis = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "mini_redis.py"), f"--port={args.redis_port}"],
+        stdout=subprocess.DEVNULL, stderr=log,
+    )
+    fakes = start_fakes(args, log)
+    env = app_env(args, REDIS_URL=redis_url, SESSION_BACKEND="redis", IMAGE_STORE_BACKEND="redis",
+                  SOCKETIO_MESSAGE_QUEUE=redis_url)
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py"), f"--workers={workers}", "--host=127.0.0.1", f"--port={args.port}"],
+        cwd=ROOT, env=env, stdout=log, stderr=log,
+    )
+    processes = [mini_redis, fakes, server]
+    ports = [args.port + index for index in range(workers)]
+    try:
+        wait_until_up(ports, processes, log, timeout=60)
+        results = []
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run_client, args=(i, args, image, results, ports[i % workers]))
+                   for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        # O app primeiro: sem o Redis, os processos ficariam tentando reconectar à fila
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    latencies = [r["latency"] * 1000 for r in results if r["outcome"] == "ok"]
+    return {"ok": len(latencies), "total": len(results), "elapsed": elapsed,
+            "p50": percentile(latencies, 50), "p95": percentile(latencies, 95)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4", help="quantidades de processos a medir")
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=5, help="rodadas por cliente")
+    parser.add_argument("--mix", default="text,vision", help=f"cenários: {','.join(SCENARIOS)}")
+    parser.add_argument("--stream", action="store_true", help="resposta em trechos (response_chunk)")
+    parser.add_argument("--always-video", action="store_true")
+    parser.add_argument("--audio-bytes", type=int, default=32_000)
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--port", type=int, default=5060, help="porta do primeiro processo")
+    parser.add_argument("--upstream-port", type=int, default=8910)
+    parser.add_argument("--redis-port", type=int, default=6399)
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    add_arguments(parser)
+    args = parser.parse_args()
+    args.mix = [scenario for scenario in args.mix.split(",") if scenario]
+    counts = [int(count) for count in args.workers.split(",") if count]
+
+    with open(args.image, "rb") as f:
+        image = base64.b64encode(f.read()).decode()
+    log = tempfile.NamedTemporaryFile("w", prefix="bench-scaling-", suffix=".log", delete=False)
+    print(f"{args.clients} clientes, {args.turns} rodadas cada, {os.cpu_count()} CPUs na máquina")
+    print(f"{'processos':>9}  {'ok':>9}  {'rodadas/s':>9}  {'p50 ms':>7}  {'p95 ms':>7}  {'ganho':>6}")
+    baseline = None
+    for workers in counts:
+        result = measure(args, workers, image, log)
+        throughput = result["ok"] / result["elapsed"]
+        baseline = baseline or throughput
+        print(f"{workers:>9}  {result['ok']:>4}/{result['total']:<4}  {throughput:>9.2f}  {result['p50']:>7.0f}  "
+              f"{result['p95']:>7.0f}  {throughput / baseline:>5.2f}x", flush=True)
+    print(f"log: {log.name}")
+
+
+if __name__ == "__main__":
+    main()
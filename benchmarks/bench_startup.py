@@ -0,0 +1,74 @@
+#benchmark da inicialização: tempo de import do app (partida a frio) e de subir N workers ao
+#mesmo tempo, com a rede bloqueada para garantir que nada é buscado fora durante o import
+#uso: python benchmarks/bench_startup.py [--runs 5] [--workers 4] [--online]
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Roda dentro do processo filho: bloqueia DNS e conexões antes de importar o app
+CHILD = """
+import socket, sys, time
+if {offline}:
+    def blocked(*args, **kwargs):
+        raise OSError("rede bloqueada no benchmark")
+    socket.getaddrinfo = blocked
+    socket.create_connection = blocked
+    socket.socket.connect = blocked
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(f"{{elapsed * 1000:.1f}}")
+"""
+
+
+def spawn(offline):
+    env = dict(os.environ)
+    # Chaves falsas: sem elas o SDK da OpenAI recusaria criar o cliente se fosse criado no import
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    env.setdefault("DEEPGRAM_API_KEY", "bench")
+    return subprocess.Popen(
+        [sys.executable, "-c", CHILD.format(offline=offline)],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+
+
+def collect(process):
+    out, err = process.communicate()
+    if process.returncode != 0:
+        raise SystemExit(f"Falha ao importar o app:\n{err.strip()}")
+    return float(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--online", action="store_true", help="não bloqueia a rede")
+    args = parser.parse_args()
+    offline = not args.online
+
+    imports = []
+    processes = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        imports.append(collect(spawn(offline)))
+        processes.append((time.perf_counter() - start) * 1000)
+    print(f"rede {'bloqueada' if offline else 'liberada'}, {args.runs} execuções")
+    print(f"import app        mediana {statistics.median(imports):8.1f} ms   máx {max(imports):8.1f} ms")
+    print(f"processo inteiro  mediana {statistics.median(processes):8.1f} ms   máx {max(processes):8.1f} ms")
+
+    # Vários workers subindo juntos (como gunicorn/eventlet com N processos)
+    start = time.perf_counter()
+    workers = [spawn(offline) for _ in range(args.workers)]
+    worker_imports = [collect(worker) for worker in workers]
+    total = (time.perf_counter() - start) * 1000
+    print(f"{args.workers} workers juntos  total {total:8.1f} ms   import mais lento {max(worker_imports):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#servidores locais que imitam as APIs externas (chat e TTS da OpenAI, STT pré-gravado do
+#Deepgram, SerpAPI e Custom Search) com latência e tamanho de resposta configuráveis,
+#para medir o app sem rede e sem custo. Com --rpm/--tpm, chat e TTS têm limite de uso como
+#o da OpenAI: cabeçalhos x-ratelimit-* em toda resposta e 429 quando o balde esvazia
+#uso: python benchmarks/fake_upstreams.py [--port 8900] [--chat-latency 0.3] ...
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+SENTENCE = "Esta é uma resposta de teste gerada pelo servidor local."
+
+
+def add_arguments(parser):
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="tempo até o primeiro token (s)")
+    parser.add_argument("--chat-chunk-delay", type=float, default=0.01, help="intervalo entre pedaços no streaming (s)")
+    parser.add_argument("--reply-words", type=int, default=30)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--tts-bytes", type=int, default=24_000)
+    parser.add_argument("--stt-latency", type=float, default=0.25)
+    parser.add_argument("--stt-text", default="me conta uma curiosidade")
+    parser.add_argument("--search-latency", type=float, default=0.4)
+    parser.add_argument("--search-results", type=int, default=5)
+    parser.add_argument("--rpm", type=int, default=0, help="requisições por minuto de chat e de TTS (0: sem limite)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens por minuto do chat (0: sem limite)")
+
+
+class RateLimit:
+    # Balde de fichas que repõe o limite por minuto continuamente, como o da OpenAI
+    def __init__(self, per_minute):
+        self.limit = per_minute
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.limit, self.available + (now - self.updated) * self.limit / 60)
+        self.updated = now
+
+    def headers(self, kind):
+        reset = (self.limit - self.available) * 60 / self.limit
+        return {f"x-ratelimit-limit-{kind}": str(self.limit), f"x-ratelimit-remaining-{kind}": str(int(self.available)),
+                f"x-ratelimit-reset-{kind}": f"{reset:.3f}s"}
+
+
+class FakeUpstreams(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como as APIs reais
+    config = None
+    requests = {}
+    limits = {}  # "chat"/"tts" -> {"requests": RateLimit, "tokens": RateLimit}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _count(self, name):
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, body, content_type="application/json", status=200, headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rate_limit(self, kind, tokens=0):
+        # Desconta a requisição (e os tokens) do balde; devolve (aceita, cabeçalhos)
+        with self.lock:
+            buckets = self.limits.setdefault(kind, {})
+            if self.config.rpm and "requests" not in buckets:
+                buckets["requests"] = RateLimit(self.config.rpm)
+            if self.config.tpm and kind == "chat" and "tokens" not in buckets:
+                buckets["tokens"] = RateLimit(self.config.tpm)
+            costs = {"requests": 1, "tokens": tokens}
+            for bucket in buckets.values():
+                bucket.refill()
+            allowed = all(bucket.available >= min(costs[name], bucket.limit) for name, bucket in buckets.items())
+            if allowed:
+                for name, bucket in buckets.items():
+                    bucket.available -= costs[name]
+            headers = {}
+            for name, bucket in buckets.items():
+                headers.update(bucket.headers(name))
+        return allowed, headers
+
+    def _too_many(self, kind, headers):
+        self._count(f"{kind}_429")
+        self._send({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                   status=429, headers=headers)
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self._body()
+        if path.endswith("/chat/completions"):
+            request = json.loads(body)
+            allowed, headers = self._rate_limit("chat", len(body) // 4 + self.config.reply_words * 2)
+            if not allowed:
+                return self._too_many("chat", headers)
+            self._count("chat")
+            self._chat(request, headers)
+        elif path.endswith("/audio/speech"):
+            allowed, headers = self._rate_limit("tts")
+            if not allowed:
+                return self._too_many("tts", headers)
+            self._count("tts")
+            time.sleep(self.config.tts_latency)
+            self._send(b"\xff\xf3" * (self.config.tts_bytes // 2), "audio/mpeg", headers=headers)
+        elif path.endswith("/v1/listen"):
+            self._count("stt")
+            time.sleep(self.config.stt_latency)
+            self._send({"results": {"channels": [{"alternatives": [{"transcript": self.config.stt_text}]}]}})
+        else:
+            self._send({"error": "not found"}, status=404)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        count = self.config.search_results
+        if path == "/stats":
+            # Contagem de requisições atendidas (e recusadas com 429) por API
+            with self.lock:
+                self._send(dict(self.requests))
+        elif path.endswith("/search.json"):
+            self._count("serpapi")
+            time.sleep(self.config.search_latency)
+            self._send({"organic_results": [
+                {"title": f"Resultado {i}", "link": f"https://exemplo{i}.com.br/pagina", "snippet": SENTENCE}
+                for i in range(count)
+            ]})
+        elif path.endswith("/customsearch/v1"):
+            self._count("custom_search")
+            time.sleep(self.config.search_latency)
+            self._send({"items": [
+                {"title": f"Resultado {i}", "link": f"https://outro{i}.com.br/", "snippet": SENTENCE}
+                for i in range(count)
+            ]})
+        else:
+            self._send({"error": "not found"}, status=404)
+
+    def _reply_text(self):
+        # Cada resposta começa diferente, para não cair sempre no cache de TTS
+        words = f"Resposta {self.requests['chat']}. " + (SENTENCE + " ") * (self.config.reply_words // 9 + 1)
+        return " ".join(words.split()[:self.config.reply_words])
+
+    def _tool_call(self, request):
+        # Pede a busca quando o ChatGPT está livre para usar funções e o pedido fala de shows
+        if request.get("tool_choice") != "auto":
+            return None
+        last = next((m for m in reversed(request["messages"]) if m["role"] == "user"), {})
+        if isinstance(last.get("content"), str) and "show" in last["content"]:
+            return {"id": "call_fake", "type": "function",
+                    "function": {"name": "websearch", "arguments": json.dumps({"query": last["content"]})}}
+        return None
+
+    def _chat(self, request, headers):
+        time.sleep(self.config.chat_latency)
+        tool_call = self._tool_call(request)
+        text = None if tool_call else self._reply_text()
+        usage = {"prompt_tokens": 500, "completion_tokens": self.config.reply_words * 2, "total_tokens": 0,
+                 "prompt_tokens_details": {"cached_tokens": 0}}
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": request.get("model")}
+
+        if not request.get("stream"):
+            message = {"role": "assistant", "content": text}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            self._send({**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}]},
+                headers=headers)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        def event(delta, finish=None, **extra):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}
+            self._chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        if tool_call:
+            event({"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]}, "tool_calls")
+        else:
+            words = text.split(" ")
+            for i in range(0, len(words), 3):
+                event({"content": " ".join(words[i:i + 3]) + " "})
+                time.sleep(self.config.chat_chunk_delay)
+            event({}, "stop")
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._chunk(f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n".encode())
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+
+def serve(config, host="127.0.0.1", port=8900):
+    handler = type("Handler", (FakeUpstreams,), {"config": config, "requests": {}, "limits": {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = serve(args, args.host, args.port)
+    print(f"APIs falsas em http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
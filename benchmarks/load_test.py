@@ -0,0 +1,244 @@
+#teste de carga sem rede: sobe as APIs falsas (fake_upstreams.py) e o app apontando para
+#elas, e vários clientes Socket.IO repetem rodadas de texto, áudio, visão e busca.
+#Mostra latência p50/p95/p99 por rodada, vazão e memória (RSS) do servidor
+#uso: python benchmarks/load_test.py [--clients 10] [--turns 5] [--stream] [--mix text,audio,vision,search]
+#com limite de uso nas APIs falsas: --rpm 300 (compare com UPSTREAM_SCHEDULER=0 no ambiente)
+#requer o cliente do python-socketio (pip install "python-socketio[client]")
+import os
+import sys
+import time
+import base64
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+
+import requests
+import socketio
+
+sys.path.insert(0, os.path.dirname(__file__))
+from fake_upstreams import add_arguments
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_IMAGE = os.path.join(ROOT, "captured_images", "captured_image.jpg")
+
+SCENARIOS = {
+    "text": "me conta uma curiosidade sobre o número {n}",
+    "audio": None,  # o texto vem do STT falso
+    "vision": "o que você vê na câmera?",
+    "search": "pesquise as notícias de hoje sobre o assunto {n}",
+    "tool": "quais os próximos shows da banda {n}?",  # ambíguo: passa pelas funções do ChatGPT
+}
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+def rss_mb(pid):
+    # RSS atual e pico (VmHWM) do processo, em MB
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":")
+                    values[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+def start_fakes(args, log):
+    fake_args = [
+        f"--chat-latency={args.chat_latency}", f"--chat-chunk-delay={args.chat_chunk_delay}",
+        f"--reply-words={args.reply_words}", f"--tts-latency={args.tts_latency}", f"--tts-bytes={args.tts_bytes}",
+        f"--stt-latency={args.stt_latency}", f"--stt-text={args.stt_text}",
+        f"--search-latency={args.search_latency}", f"--search-results={args.search_results}",
+        f"--rpm={args.rpm}", f"--tpm={args.tpm}",
+    ]
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "fake_upstreams.py"), f"--port={args.upstream_port}", *fake_args],
+        stdout=subprocess.DEVNULL, stderr=log,
+    )
+
+
+def app_env(args, **extra):
+    # Chaves falsas e endereços das APIs trocados pelos servidores locais
+    upstream = f"http://127.0.0.1:{args.upstream_port}"
+    return dict(
+        os.environ,
+        OPENAI_API_KEY="sk-fake", DEEPGRAM_API_KEY="fake", apikey_search="fake", CS_API_KEY="fake", CS_CX="fake",
+        OPENAI_BASE_URL=f"{upstream}/v1", DEEPGRAM_BASE_URL=upstream, SERPAPI_BASE_URL=upstream,
+        CUSTOM_SEARCH_BASE_URL=f"{upstream}/", TTS_CACHE_DIR=tempfile.mkdtemp(prefix="tts-bench-"),
+        STT_BACKEND="buffered", **extra,
+    )
+
+
+def wait_until_up(ports, processes, log, timeout=30):
+    deadline = time.time() + timeout
+    pending = list(ports)
+    while pending and time.time() < deadline:
+        if any(process.poll() is not None for process in processes):
+            break
+        try:
+            if requests.get(f"http://127.0.0.1:{pending[0]}/", timeout=1).ok:
+                pending.pop(0)
+        except requests.RequestException:
+            time.sleep(0.2)
+    if pending:
+        for process in processes:
+            process.kill()
+        raise SystemExit(f"O app não subiu; veja o log em {log.name}")
+
+
+def start_processes(args, log):
+    fakes = start_fakes(args, log)
+    server = subprocess.Popen(
+        [sys.executable, "-c",
+         # Como o __main__ do app, mas sem TLS e sem o pré-aquecimento do TTS
+         f"import app; app.openai_client(); "
+         f"app.socketio.run(app.app, host='127.0.0.1', port={args.port}, log_output=False)"],
+        cwd=ROOT, env=app_env(args), stdout=log, stderr=log,
+    )
+    wait_until_up([args.port], [fakes, server], log)
+    return fakes, server
+
+
+def run_client(index, args, image, results, port=None):
+    client = socketio.Client(reconnection=False)
+    done = threading.Event()
+    turn = {}
+
+    def finish(outcome):
+        turn["end"] = time.perf_counter()
+        turn["outcome"] = outcome
+        done.set()
+
+    @client.on("response_chunk")
+    def on_chunk(data):
+        turn.setdefault("first_audio", time.perf_counter())
+
+    client.on("response", lambda data: finish("ok"))
+    client.on("response_end", lambda data: finish("ok"))
+    client.on("error", lambda data: finish("error"))
+    client.on("busy", lambda data: finish("busy"))
+
+    client.connect(f"http://127.0.0.1:{port or args.port}", wait_timeout=10)
+    rng = random.Random(index)
+    try:
+        for n in range(args.turns):
+            scenario = rng.choice(args.mix)
+            data = {"stream": args.stream}
+            if scenario == "audio":
+                data["audio"] = "data:audio/wav;base64," + base64.b64encode(os.urandom(args.audio_bytes)).decode()
+            else:
+                data["text"] = SCENARIOS[scenario].format(n=f"{index}-{n}")
+            if scenario == "vision" or args.always_video:
+                data["video"] = "data:image/jpeg;base64," + image
+            turn.clear()
+            done.clear()
+            start = time.perf_counter()
+            client.emit("process_data", data)
+            if not done.wait(args.timeout):
+                finish("timeout")
+            first_audio = turn.get("first_audio")
+            results.append({
+                "scenario": scenario,
+                "outcome": turn["outcome"],
+                "latency": turn["end"] - start,
+                "first_audio": first_audio - start if first_audio else None,
+            })
+            if args.think_time:
+                time.sleep(args.think_time)
+    finally:
+        client.disconnect()
+
+
+def report(results, elapsed, rss_samples):
+    ok = [r for r in results if r["outcome"] == "ok"]
+    latencies = [r["latency"] * 1000 for r in ok]
+    busy = sum(1 for r in results if r["outcome"] == "busy")
+    print(f"rodadas: {len(results)} ({len(ok)} ok, {busy} recusadas por ocupação, "
+          f"{len(results) - len(ok) - busy} com erro/timeout) em {elapsed:.1f}s")
+    print(f"vazão: {len(ok) / elapsed:.2f} rodadas/s")
+    print(f"latência (ms)   p50 {percentile(latencies, 50):8.0f}   p95 {percentile(latencies, 95):8.0f}   "
+          f"p99 {percentile(latencies, 99):8.0f}")
+    first_audio = [r["first_audio"] * 1000 for r in ok if r["first_audio"]]
+    if first_audio:
+        print(f"1º áudio (ms)   p50 {percentile(first_audio, 50):8.0f}   p95 {percentile(first_audio, 95):8.0f}   "
+              f"p99 {percentile(first_audio, 99):8.0f}")
+    for scenario in sorted({r["scenario"] for r in results}):
+        values = [r["latency"] * 1000 for r in ok if r["scenario"] == scenario]
+        if values:
+            print(f"  {scenario:<8} n={len(values):<4} p50 {percentile(values, 50):8.0f}   p95 {percentile(values, 95):8.0f}")
+    rss = [current for current, _ in rss_samples if current]
+    peaks = [peak for _, peak in rss_samples if peak]
+    if rss:
+        print(f"RSS do servidor: início {rss[0]:.0f} MB, média {statistics.mean(rss):.0f} MB, "
+              f"pico {max(peaks or rss):.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=5, help="rodadas por cliente")
+    parser.add_argument("--mix", default="text,audio,vision,search", help=f"cenários: {','.join(SCENARIOS)}")
+    parser.add_argument("--stream", action="store_true", help="resposta em trechos (response_chunk)")
+    parser.add_argument("--always-video", action="store_true", help="manda o frame em toda rodada, como o navegador")
+    parser.add_argument("--audio-bytes", type=int, default=32_000)
+    parser.add_argument("--think-time", type=float, default=0.0, help="pausa entre rodadas de cada cliente (s)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--upstream-port", type=int, default=8900)
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    add_arguments(parser)
+    args = parser.parse_args()
+    args.mix = [scenario for scenario in args.mix.split(",") if scenario]
+    unknown = set(args.mix) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    with open(args.image, "rb") as f:
+        image = base64.b64encode(f.read()).decode()
+    log = tempfile.NamedTemporaryFile("w", prefix="load-test-", suffix=".log", delete=False)
+    fakes, server = start_processes(args, log)
+
+    rss_samples = [rss_mb(server.pid)]
+    sampling = threading.Event()
+
+    def sample():
+        while not sampling.wait(0.2):
+            rss_samples.append(rss_mb(server.pid))
+
+    threading.Thread(target=sample, daemon=True).start()
+    results = []
+    try:
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run_client, args=(i, args, image, results)) for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        sampling.set()
+        print(f"{args.clients} clientes, {args.turns} rodadas cada, streaming {'sim' if args.stream else 'não'}")
+        report(results, elapsed, rss_samples)
+        stats = requests.get(f"http://127.0.0.1:{args.upstream_port}/stats", timeout=5).json()
+        print("APIs falsas: " + ", ".join(f"{name} {count}" for name, count in sorted(stats.items())))
+        print(f"log do servidor: {log.name}")
+    finally:
+        sampling.set()
+        server.terminate()
+        fakes.terminate()
+        server.wait(10)
+        fakes.wait(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#servidor local compatível com o Redis (RESP2 e RESP3) para testes e benchmarks sem um
+#Redis instalado: chaves com expiração (sessões, imagens) e pub/sub (fila de mensagens do
+#Socket.IO entre processos). Só os comandos que o app, o redis-py e o python-socketio usam
+#uso: python benchmarks/mini_redis.py [--port 6399]
+import time
+import fnmatch
+import argparse
+import threading
+import socketserver
+
+OK = b"+OK\r\n"
+
+
+def encode(value, resp3=False, kind=b"*"):
+    # kind: b"*" (array) ou b">" (push do RESP3, usado no pub/sub)
+    if value is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, dict):
+        return b"%%%d\r\n" % len(value) + b"".join(encode(k, resp3) + encode(v, resp3) for k, v in value.items())
+    return kind + b"%d\r\n" % len(value) + b"".join(encode(item, resp3) for item in value)
+
+
+def error(message):
+    return f"-ERR {message}\r\n".encode("utf-8")
+
+
+class Store:
+    def __init__(self):
+        self.data = {}  # chave -> (valor, expira_em ou None)
+        self.channels = {}  # canal -> conexões assinantes
+        self.patterns = {}  # padrão -> conexões assinantes
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+class Connection(socketserver.StreamRequestHandler):
+    store = None
+
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+        self.channels = set()
+        self.patterns = set()
+        self.resp3 = False  # o redis-py 8 pede RESP3 com HELLO 3 ao conectar
+
+    def encode(self, value):
+        return encode(value, self.resp3)
+
+    def push(self, items):
+        # Mensagens e confirmações do pub/sub
+        return encode(items, self.resp3, b">" if self.resp3 else b"*")
+
+    def send(self, data):
+        with self.write_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def read_command(self):
+        # Comandos chegam como array de bulk strings; aceita também a forma "inline" (telnet)
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        try:
+            while True:
+                args = self.read_command()
+                if args is None:
+                    return
+                if args:
+                    self.send(self.execute(args[0].decode().upper(), args[1:]))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self.store.lock:
+                for subscribers in list(self.store.channels.values()) + list(self.store.patterns.values()):
+                    subscribers.discard(self)
+
+    def execute(self, command, args):
+        handler = getattr(self, f"cmd_{command.lower()}", None)
+        if handler is None:
+            return error(f"unknown command '{command}'")
+        if (self.channels or self.patterns) and not self.resp3 and command not in (
+                "SUBSCRIBE", "UNSUBSCRIBE", "PSUBSCRIBE", "PUNSUBSCRIBE", "PING"):
+            return error("only (P)SUBSCRIBE / (P)UNSUBSCRIBE / PING allowed in this context")
+        try:
+            with self.store.lock:
+                return handler(*args)
+        except (TypeError, ValueError):
+            return error(f"wrong arguments for '{command}' command")
+
+    # Conexão
+    def cmd_hello(self, protocol=b"2", *args):
+        if protocol not in (b"2", b"3"):
+            return b"-NOPROTO unsupported protocol version\r\n"
+        self.resp3 = protocol == b"3"
+        return self.encode({b"server": b"redis", b"version": b"7.0.0", b"proto": int(protocol), b"id": 1,
+                            b"mode": b"standalone", b"role": b"master", b"modules": []})
+
+    def cmd_ping(self, message=None):
+        if (self.channels or self.patterns) and not self.resp3:
+            return self.encode([b"pong", message or b""])
+        return self.encode(message) if message is not None else b"+PONG\r\n"
+
+    def cmd_echo(self, message):
+        return self.encode(message)
+
+    def cmd_select(self, db):
+        return OK
+
+    def cmd_client(self, *args):
+        return self.encode(b"") if args and args[0].upper() == b"GETNAME" else OK
+
+    def cmd_info(self, *args):
+        return self.encode(b"# Server\r\nredis_version:7.0.0-mini\r\n")
+
+    def cmd_command(self, *args):
+        return self.encode([])
+
+    # Chaves
+    def cmd_get(self, key):
+        return self.encode(self.store.get(key))
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() if isinstance(option, bytes) else option for option in options]
+        expires_at = None
+        for flag, scale in ((b"EX", 1), (b"PX", 0.001)):
+            if flag in options:
+                expires_at = time.monotonic() + int(options[options.index(flag) + 1]) * scale
+        exists = self.store.get(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return self.encode(None)
+        self.store.data[key] = (value, expires_at)
+        return OK
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self.store.get(key) is not None:
+                del self.store.data[key]
+                removed += 1
+        return self.encode(removed)
+
+    cmd_unlink = cmd_del
+
+    def cmd_exists(self, *keys):
+        return self.encode(sum(1 for key in keys if self.store.get(key) is not None))
+
+    def cmd_expire(self, key, seconds):
+        value = self.store.get(key)
+        if value is None:
+            return self.encode(0)
+        self.store.data[key] = (value, time.monotonic() + int(seconds))
+        return self.encode(1)
+
+    def cmd_ttl(self, key):
+        if self.store.get(key) is None:
+            return self.encode(-2)
+        expires_at = self.store.data[key][1]
+        return self.encode(-1 if expires_at is None else max(0, round(expires_at - time.monotonic())))
+
+    def cmd_dbsize(self):
+        return self.encode(sum(1 for key in list(self.store.data) if self.store.get(key) is not None))
+
+    def cmd_flushall(self, *args):
+        self.store.data.clear()
+        return OK
+
+    cmd_flushdb = cmd_flushall
+
+    # Pub/sub
+    def cmd_publish(self, channel, message):
+        receivers = [(connection, [b"message", channel, message])
+                     for connection in self.store.channels.get(channel, ())]
+        for pattern, connections in self.store.patterns.items():
+            if fnmatch.fnmatchcase(channel.decode("utf-8", "replace"), pattern.decode("utf-8", "replace")):
+                receivers.extend((connection, [b"pmessage", pattern, channel, message]) for connection in connections)
+        for connection, payload in receivers:
+            try:
+                connection.send(connection.push(payload))
+            except OSError:
+                pass
+        return self.encode(len(receivers))
+
+    def _subscribe(self, kind, registry, mine, names):
+        replies = []
+        for name in names:
+            registry.setdefault(name, set()).add(self)
+            mine.add(name)
+            replies.append(self.push([kind, name, len(self.channels) + len(self.patterns)]))
+        return b"".join(replies)
+
+    def _unsubscribe(self, kind, registry, mine, names):
+        replies = []
+        for name in names or list(mine) or [None]:
+            if name is not None:
+                registry.get(name, set()).discard(self)
+                mine.discard(name)
+            replies.append(self.push([kind, name, len(self.channels) + len(self.patterns)]))
+        return b"".join(replies)
+
+    def cmd_subscribe(self, *channels):
+        return self._subscribe(b"subscribe", self.store.channels, self.channels, channels)
+
+    def cmd_unsubscribe(self, *channels):
+        return self._unsubscribe(b"unsubscribe", self.store.channels, self.channels, channels)
+
+    def cmd_psubscribe(self, *patterns):
+        return self._subscribe(b"psubscribe", self.store.patterns, self.patterns, patterns)
+
+    def cmd_punsubscribe(self, *patterns):
+        return self._unsubscribe(b"punsubscribe", self.store.patterns, self.patterns, patterns)
+
+
+class MiniRedis(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(host="127.0.0.1", port=6399):
+    handler = type("Handler", (Connection,), {"store": Store()})
+    return MiniRedis((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    args = parser.parse_args()
+    server = serve(args.host, args.port)
+    print(f"Redis local em redis://{args.host}:{args.port}/0", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#clientes das APIs externas criados sob demanda: importar o app não abre conexão nem
+#carrega os SDKs; cada cliente nasce na primeira chamada e, se falhar, tenta de novo na próxima
+import os
+import queue
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+import http_client
+
+logger = logging.getLogger(__name__)
+
+CUSTOM_SEARCH_DISCOVERY = os.getenv(
+    "CUSTOM_SEARCH_DISCOVERY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "discovery", "customsearch.v1.json"),
+)
+CUSTOM_SEARCH_BASE_URL = os.getenv("CUSTOM_SEARCH_BASE_URL", "")  # vazio: o endereço do documento
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+def lazy_client(factory):
+    # Guarda a instância depois do primeiro sucesso; erro não fica em cache
+    lock = threading.Lock()
+    instance = []
+
+    @wraps(factory)
+    def get():
+        if instance:
+            return instance[0]
+        with lock:
+            if not instance:
+                try:
+                    instance.append(factory())
+                except Exception as e:
+                    logger.error(f"Erro ao inicializar o cliente {factory.__name__}: {e}")
+                    raise
+                logger.info(f"Cliente {factory.__name__} inicializado.")
+        return instance[0]
+
+    get.reset = instance.clear
+    return get
+
+
+@lazy_client
+def openai_client():
+    from openai import OpenAI
+
+    # Pool HTTP compartilhado (keep-alive, HTTP/2 se disponível); o SDK lê OPENAI_BASE_URL.
+    # As retentativas ficam no agendador do http_client, que conhece os limites da chave
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client.httpx_client(), max_retries=0)
+
+
+@lazy_client
+def deepgram_client():
+    from deepgram import DeepgramClient
+
+    return DeepgramClient(os.getenv("DEEPGRAM_API_KEY"))
+
+
+@lazy_client
+def search_service():
+    import httplib2
+    from googleapiclient.discovery import build_from_document
+
+    # Documento de descoberta salvo no repositório: nada de buscá-lo na rede ao iniciar
+    with open(CUSTOM_SEARCH_DISCOVERY, encoding="utf-8") as f:
+        document = f.read()
+    client_options = {"api_endpoint": CUSTOM_SEARCH_BASE_URL} if CUSTOM_SEARCH_BASE_URL else None
+    return build_from_document(document, developerKey=os.getenv("CS_API_KEY"), client_options=client_options,
+                               http=httplib2.Http(timeout=http_client.HTTP_READ_TIMEOUT))
+
+
+@lazy_client
+def redis_client():
+    import redis
+
+    # Um pool só para sessões e imagens compartilhadas entre os processos (ver serve.py)
+    logger.info(f"Usando Redis: {REDIS_URL}")
+    return redis.Redis.from_url(REDIS_URL)
+
+
+_search_http = queue.LifoQueue()
+
+
+@contextmanager
+def search_http():
+    # Um httplib2.Http não pode ser lido por duas green threads ao mesmo tempo: cada busca
+    # pega uma conexão livre (mantida aberta entre as buscas) e a devolve no fim.
+    # Busca interrompida ou com erro descarta a conexão
+    import httplib2
+
+    try:
+        http = _search_http.get_nowait()
+    except queue.Empty:
+        http = httplib2.Http(timeout=http_client.HTTP_READ_TIMEOUT)
+    yield http
+    _search_http.put(http)
@@ -0,0 +1,188 @@
+#janela de contexto com orçamento de tokens e resumo incremental das mensagens antigas
+import os
+import json
+import logging
+import threading
+
+from session_store import new_session_state
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_MAX_TURNS = int(os.getenv("CONTEXT_MAX_TURNS", "8"))
+IMAGE_TOKENS = 765  # custo aproximado de uma imagem em alta resolução
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+
+def count_text_tokens(text):
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # Aproximação quando o tiktoken não está instalado (~4 caracteres por token)
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(message):
+    tokens = 4  # sobrecarga de cada mensagem no formato de chat
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += count_text_tokens(content)
+    elif isinstance(content, list):
+        for part in content:
+            if part.get("type") == "text":
+                tokens += count_text_tokens(part.get("text"))
+            else:
+                tokens += IMAGE_TOKENS
+    for tool_call in message.get("tool_calls") or []:
+        tokens += count_text_tokens(json.dumps(tool_call.get("function", {}), ensure_ascii=False))
+    return tokens
+
+
+def _is_turn_start(message):
+    # Uma rodada começa numa mensagem de texto do usuário; cortar ali nunca separa
+    # uma chamada de função da sua resposta
+    return message.get("role") == "user" and isinstance(message.get("content"), str)
+
+
+def _summary_key(sid):
+    return f"{sid}:summary"
+
+
+def _as_transcript(messages):
+    lines = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = "[imagem]"
+        if content:
+            lines.append(f"{message['role']}: {content}")
+    return "\n".join(lines)
+
+
+class ContextManager:
+    def __init__(self, system_message, summarize_fn, store,
+                 token_budget=CONTEXT_TOKEN_BUDGET, max_turns=CONTEXT_MAX_TURNS):
+        self.system_message = system_message
+        self.system_tokens = count_message_tokens(system_message)
+        self.summarize_fn = summarize_fn  # (resumo_anterior, transcrição) -> novo resumo
+        self.store = store
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        state = self.store.get(sid) or new_session_state()
+        self._apply_summary(sid, state)
+        return state
+
+    def save(self, sid, state):
+        # Junta o resumo que terminou durante a rodada antes de gravar
+        self._apply_summary(sid, state)
+        self.store.set(sid, state)
+
+    def delete(self, sid):
+        self.store.delete(sid)
+        self.store.delete(_summary_key(sid))
+
+    def _apply_summary(self, sid, state):
+        # O registro diz até qual mensagem (base) o resumo vai; o estado só avança, então
+        # aplicar o mesmo resumo de novo não muda nada
+        record = self.store.get(_summary_key(sid))
+        if not record:
+            return
+        count = record["base"] - state["base"]
+        if count <= 0:
+            return
+        del state["history"][:count]
+        del state["tokens"][:count]
+        state["base"] = record["base"]
+        state["summary"] = record["summary"]
+
+    def append(self, state, message):
+        # Conta os tokens uma única vez, quando a mensagem entra no histórico
+        state["history"].append(message)
+        state["tokens"].append(count_message_tokens(message))
+
+    def _window_start(self, state):
+        history = state["history"]
+        tokens = state["tokens"]
+        budget = self.token_budget - self.system_tokens
+        if state.get("summary"):
+            budget -= count_text_tokens(state["summary"]) + 4
+
+        used = 0
+        turns = 0
+        start = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            used += tokens[i]
+            if used > budget:
+                break
+            if _is_turn_start(history[i]):
+                start = i
+                turns += 1
+                if turns >= self.max_turns:
+                    break
+        # Garante ao menos a rodada atual, mesmo que ela sozinha estoure o orçamento
+        if start == len(history):
+            for i in range(len(history) - 1, -1, -1):
+                if _is_turn_start(history[i]):
+                    return i
+            return 0
+        return start
+
+    def window(self, state):
+        # Mensagens do histórico que vão na próxima requisição
+        return state["history"][self._window_start(state):]
+
+    def build_messages(self, sid, state):
+        start = self._window_start(state)
+        messages = [self.system_message]
+        if state.get("summary"):
+            messages.append({"role": "system", "content": f"Resumo da conversa até aqui: {state['summary']}"})
+        messages.extend(state["history"][start:])
+
+        if start > 0:
+            self._schedule_summary(sid, state["base"] + start)
+        return messages
+
+    def _schedule_summary(self, sid, upto):
+        with self._lock:
+            if sid in self._pending:
+                return
+            self._pending.add(sid)
+        # Roda fora do caminho da requisição; até terminar, as mensagens antigas só ficam de fora
+        threading.Thread(target=self._summarize, args=(sid, upto), daemon=True).start()
+
+    def _summarize(self, sid, upto):
+        # Não grava o estado: a rodada em andamento tem a própria cópia e a salvaria por cima
+        # (com o Redis, sempre). O resumo fica num registro à parte, aplicado por load/save
+        try:
+            state = self.store.get(sid)
+            if state is None:
+                return
+            # Só lê o estado: na memória ele é o mesmo dicionário que a rodada está usando
+            base, summary = state["base"], state.get("summary", "")
+            record = self.store.get(_summary_key(sid))
+            if record and record["base"] > base:
+                base, summary = record["base"], record["summary"]
+            start, count = base - state["base"], upto - base
+            if count <= 0:
+                return
+            transcript = _as_transcript(state["history"][start:start + count])
+            summary = self.summarize_fn(summary, transcript)
+            if not summary:
+                return
+            self.store.set(_summary_key(sid), {"base": upto, "summary": summary})
+            logger.info(f"Contexto resumido para {sid}: {count} mensagens")
+        except Exception as e:
+            logger.error(f"Erro ao resumir o contexto: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(sid)
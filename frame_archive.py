@@ -0,0 +1,45 @@
+#arquivamento opcional dos frames em disco, por sessão e fora da green thread da requisição
+import os
+import time
+import logging
+
+import eventlet
+from eventlet import tpool
+
+logger = logging.getLogger(__name__)
+
+FRAME_ARCHIVE_DIR = os.getenv("FRAME_ARCHIVE_DIR")  # vazio = não grava em disco
+
+
+def _safe_name(sid):
+    return "".join(c for c in sid if c.isalnum() or c in "-_")
+
+
+def _write_frame(path, image_bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(image_bytes)
+
+
+class FrameArchiver:
+    def __init__(self, directory=FRAME_ARCHIVE_DIR):
+        self.directory = directory
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def archive(self, sid, image_hash, image_bytes):
+        if not self.enabled:
+            return
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{image_hash[:12]}.jpg"
+        path = os.path.join(self.directory, _safe_name(sid), name)
+        # A escrita roda no pool de threads nativas do eventlet, sem bloquear o hub
+        eventlet.spawn_n(self._archive, path, image_bytes)
+
+    def _archive(self, path, image_bytes):
+        try:
+            tpool.execute(_write_frame, path, image_bytes)
+            logger.info(f"Frame arquivado: {path}")
+        except Exception as e:
+            logger.error(f"Erro ao arquivar o frame: {e}")
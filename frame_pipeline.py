@@ -0,0 +1,132 @@
+#pré-processamento dos frames da câmera antes de enviar ao modelo de visão
+import os
+import math
+import logging
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# O gpt-4o reduz a imagem para caber em 2048x2048 e depois deixa o lado menor com 768px;
+# qualquer resolução acima disso só aumenta o upload
+FRAME_MAX_LONG_SIDE = int(os.getenv("FRAME_MAX_LONG_SIDE", "2048"))
+FRAME_MAX_SHORT_SIDE = int(os.getenv("FRAME_MAX_SHORT_SIDE", "768"))
+FRAME_JPEG_QUALITY = int(os.getenv("FRAME_JPEG_QUALITY", "80"))
+# Frames a até N bits de distância (de 64) são considerados a mesma cena
+FRAME_DEDUP_THRESHOLD = int(os.getenv("FRAME_DEDUP_THRESHOLD", "5"))
+FRAME_CACHE_MAX_ENTRIES = int(os.getenv("FRAME_CACHE_MAX_ENTRIES", "256"))
+
+
+def _parse_crop(value):
+    # FRAME_CROP="x,y,largura,altura" em frações da imagem, ex.: "0.1,0.1,0.8,0.8"
+    if not value:
+        return None
+    x, y, w, h = (float(v) for v in value.split(","))
+    return x, y, w, h
+
+FRAME_CROP = _parse_crop(os.getenv("FRAME_CROP"))
+
+
+def target_size(width, height, max_long=FRAME_MAX_LONG_SIDE, max_short=FRAME_MAX_SHORT_SIDE):
+    scale = min(1.0, max_long / max(width, height), max_short / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def estimate_image_tokens(width, height):
+    # Fórmula de custo do gpt-4o em alta resolução: 85 + 170 por bloco de 512x512
+    width, height = target_size(width, height, 2048, 768)
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+def crop_frame(image, crop):
+    height, width = image.shape[:2]
+    x, y, w, h = crop
+    left, top = int(x * width), int(y * height)
+    right, bottom = min(width, left + int(w * width)), min(height, top + int(h * height))
+    if right <= left or bottom <= top:
+        return image
+    return image[top:bottom, left:right]
+
+
+def decode_frame(image_bytes):
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Frame não pôde ser decodificado")
+    return image
+
+
+def normalize_image(image, image_bytes, crop=FRAME_CROP, quality=FRAME_JPEG_QUALITY):
+    """Reduz, recorta e recodifica um frame já decodificado; devolve os bytes JPEG e as dimensões finais."""
+    if crop:
+        image = crop_frame(image, crop)
+
+    height, width = image.shape[:2]
+    new_width, new_height = target_size(width, height)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Falha ao recodificar o frame")
+    encoded = encoded.tobytes()
+
+    # Sem recorte nem redução, fica com o que for menor
+    if not crop and (new_width, new_height) == (width, height) and len(encoded) >= len(image_bytes):
+        return image_bytes, (width, height)
+    return encoded, (new_width, new_height)
+
+
+def normalize_frame(image_bytes, crop=FRAME_CROP, quality=FRAME_JPEG_QUALITY):
+    return normalize_image(decode_frame(image_bytes), image_bytes, crop, quality)
+
+
+def dhash(image):
+    # Hash perceptual de 64 bits: compara o brilho de pixels vizinhos numa miniatura 9x8
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+# Cache LRU de frames recentes por sessão: impressão digital -> hash da imagem já processada.
+# Separado por sessão para nunca reaproveitar o frame de outro usuário
+class FrameCache:
+    def __init__(self, max_entries=FRAME_CACHE_MAX_ENTRIES, threshold=FRAME_DEDUP_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (sid, impressão digital) -> hash da imagem
+        self._lock = threading.Lock()
+
+    def lookup(self, sid, fingerprint):
+        with self._lock:
+            best, best_distance = None, self.threshold + 1
+            for key in self._entries:
+                if key[0] != sid:
+                    continue
+                distance = hamming_distance(key[1], fingerprint)
+                if distance < best_distance:
+                    best, best_distance = key, distance
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            return self._entries[best]
+
+    def add(self, sid, fingerprint, image_hash):
+        with self._lock:
+            self._entries[(sid, fingerprint)] = image_hash
+            self._entries.move_to_end((sid, fingerprint))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def drop_session(self, sid):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == sid]:
+                del self._entries[key]
@@ -1,16 +1,29 @@
 #openai functions call - actions
-import openai
 import json, os
 from dotenv import load_dotenv
 load_dotenv(dotenv_path=".env.local")
-openai.api_key = os.getenv("OPENAI_API_KEY")
 wheather_api_key = os.getenv("OPENWEATHER_API_KEY")
 search_api = os.getenv("apikey_search")
+SEARCH_GL = "br"  # localidade das buscas (país / idioma)
+SEARCH_HL = "br"
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com").rstrip("/")
 
 import requests
+import http_client
+from clients import search_service, search_http
+from search_cache import SearchCache
+from tool_registry import tools
+from search_orchestrator import SearchOrchestrator
+from search_results import from_serpapi, from_custom_search, build_payload
 
 
 #define function weather
+@tools.tool(
+    "Use esta função para obter a previsão do tempo ou o tempo atual em uma cidade.",
+    exclude=("api_key",),
+    location="Cidade e país, ex.: São Paulo, BR",
+    cnt="Quantos intervalos de 3 horas à frente para a previsão; 0 para o tempo atual.",
+)
 def get_weather_forecast(location, cnt=1, api_key = wheather_api_key):
     """Get the weather forecast or current weather in a given location"""
 
@@ -25,7 +38,7 @@ def get_weather_forecast(location, cnt=1, api_key = wheather_api_key):
             "units": "metric",}
 
         try:
-            response = requests.get(url, params=params)
+            response = http_client.get(url, params=params)
             response.raise_for_status()  # Raise an exception for non-2xx responses
             data = response.json()
             #print(data)
@@ -63,7 +76,7 @@ def get_weather_forecast(location, cnt=1, api_key = wheather_api_key):
             "units": "metric",}
 
         try:
-            response = requests.get(url, params=params)
+            response = http_client.get(url, params=params)
             response.raise_for_status()  # Raise an exception for non-2xx responses
             data = response.json()
                    
@@ -90,88 +103,67 @@ def get_weather_forecast(location, cnt=1, api_key = wheather_api_key):
 
 
     
-#def function to serpapi search engine
-from serpapi import GoogleSearch
+#def function to serpapi search engine (API JSON direto, pelo pool HTTP compartilhado)
 def search_serpapi(query):
-    local_results = []
-    answer_box = []
     params = {
         "engine": "google", #"duckduckgo"
         "q": query,
-        "gl": "br",
+        "gl": SEARCH_GL,
         "api_key": search_api 
     }
-    search = GoogleSearch(params)
-    results = search.get_dict()
-    organic_results = results["organic_results"]
+    response = http_client.get(f"{SERPAPI_BASE_URL}/search.json", params=params)
+    response.raise_for_status()
 
-    if "local_results" in results:
-        local_results = results["local_results"]
-
-    if "answer_box" in results:
-        answer_box = results["answer_box"]
-
-    resultado_local = json.dumps(local_results, indent=4)
-    resultado_box = json.dumps(answer_box, indent=4)
-    
-    
-    snipts = [resultado['snippet'] for resultado in organic_results[:3]]
-    snipts_result = ', '.join(snipts)
-    final_result = resultado_box + "\n" + resultado_local + "\n" + snipts_result
-    return final_result
+    # Sem nenhum resultado útil, devolve None para a busca seguir no outro backend
+    return from_serpapi(response.json()) or None
 
 
 #google custom API Search
 import requests
 import json
 
-CS_API_KEY = os.getenv("CS_API_KEY")
 CS_CX = os.getenv("CS_CX")
 
-from googleapiclient.discovery import build
-
-# Define your API key and API version
-api_key = CS_API_KEY
-api_version = "v1"
-# Create a custom search engine service
-service = build("customsearch", api_version, developerKey=api_key)
-# Function to execute the search
+# Function to execute the search (o serviço é criado na primeira busca, ver clients.py)
 def execute_search(query):
     try:
-        results = service.cse().list(
-            cx=CS_CX,
-            start = 1,
-            num = 3,
-            #dateRestrict = 'm1'
-            q=query,
-            hl = 'br',
-            gl = 'br',
-        ).execute()
+        with search_http() as http:
+            results = search_service().cse().list(
+                cx=CS_CX,
+                start = 1,
+                num = 3,
+                #dateRestrict = 'm1'
+                q=query,
+                hl = SEARCH_HL,
+                gl = SEARCH_GL,
+            ).execute(http=http)
         
-        # Handle the search results here (result variable) to return jason
-        final_result = []
-        
-        if results['items']:
-            for item in results['items']:
-                title = item['title']
-                link = item['link']
-                snippet = item['snippet']
-                res = [title, link, snippet]
-                final_result.append(json.dumps(res, indent=4))
-                #print (json.dumps(res, indent=4))
-
-        return final_result
+        # Converte para o formato comum dos resultados
+        return from_custom_search(results) or None
 
     except Exception as e:
         print("Error executing search:", e)
 
+#cache das buscas: a mesma pergunta (mesma localidade) custa uma busca por janela de TTL
+search_cache = SearchCache()
+
+#os dois backends correm com prazo: o mais rápido (pelo histórico) é o primário e o outro
+#recebe a busca de reserva se o primário demorar ou falhar
+search_orchestrator = SearchOrchestrator([
+    ("serpapi", search_serpapi),
+    ("custom_search", execute_search),
+])
+
+def _websearch(query):
+    items = search_orchestrator.search(query)
+    return build_payload(query, items) if items else None
+
+@tools.tool(
+    "Use esta função para responder perguntas que requerem informações atualizadas da internet, como eventos recentes, agendas de eventos e informações sobre o dia atual ou datas futuras.",
+    query="Consulta para buscar na web, ex.: quem ganhou o US Open este ano?, noticias hoje?, me atualize de determinado assunto, quais os próximos shows do artista X?",
+)
 def websearch(query):
-    r = search_serpapi(query)
-    if r is not None:
-        return r
-    else:
-        print("Using custom search engine")
-        return execute_search(query)
+    return search_cache.get_or_fetch(query, lambda: _websearch(query), gl=SEARCH_GL, hl=SEARCH_HL)
     
 
 
@@ -0,0 +1,125 @@
+#camada HTTP compartilhada para as chamadas externas: pool de conexões com keep-alive,
+#limite de concorrência por host, timeouts e métricas do pool. Limites de uso das APIs,
+#prioridade e retentativas de 429/5xx ficam no agendador (upstream_scheduler.py)
+import os
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from upstream_scheduler import scheduler, request_cost
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # conexões mantidas por host
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "20"))  # requisições simultâneas por host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+
+# Só falhas de conexão: respostas 429/5xx voltam para o agendador, que repete com prazo
+_retry = Retry(
+    total=HTTP_RETRIES,
+    backoff_factor=0.3,
+    status_forcelist=[],
+    allowed_methods=None,  # as chamadas feitas aqui podem ser repetidas com segurança
+    raise_on_status=False,
+)
+
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=_retry)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+_host_limits = defaultdict(lambda: threading.BoundedSemaphore(HTTP_MAX_PER_HOST))
+_httpx_stats = defaultdict(lambda: {"requests": 0, "new_connections": 0})
+_lock = threading.Lock()
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    host = urlsplit(url).netloc
+    with _lock:
+        limit = _host_limits[host]
+    model, cost = request_cost(kwargs.get("json"))
+
+    # A vaga do host só é ocupada depois de o agendador liberar a chamada
+    def send():
+        with limit:
+            return session.request(method, url, **kwargs)
+
+    return scheduler.call(send, host, (kwargs.get("headers") or {}).get("Authorization"), model, cost)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def httpx_client(max_connections=HTTP_MAX_PER_HOST):
+    """Cliente httpx com pool e HTTP/2 (se o pacote h2 estiver instalado), para o SDK da OpenAI."""
+    import httpx
+
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    def on_request(req):
+        host = req.url.host
+        with _lock:
+            _httpx_stats[host]["requests"] += 1
+
+        # Cada conexão TCP nova aparece no trace do httpcore; o resto foi reaproveitado
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                with _lock:
+                    _httpx_stats[host]["new_connections"] += 1
+        req.extensions["trace"] = trace
+
+    # Toda requisição do SDK passa pelo agendador, inclusive as retentativas
+    class ScheduledTransport(httpx.BaseTransport):
+        def __init__(self, transport):
+            self._transport = transport
+
+        def handle_request(self, req):
+            model, cost = request_cost(req.read())
+            return scheduler.call(lambda: self._transport.handle_request(req), req.url.netloc.decode(),
+                                  req.headers.get("authorization"), model, cost,
+                                  retry_on=(httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError))
+
+        def close(self):
+            self._transport.close()
+
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.Client(
+        transport=ScheduledTransport(httpx.HTTPTransport(http2=http2, limits=limits)),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        event_hooks={"request": [on_request]},
+    )
+
+
+def pool_stats():
+    # Por host: requisições feitas, conexões novas (miss) e reaproveitadas (hit)
+    stats = {}
+    pools = _adapter.poolmanager.pools
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is not None:
+            stats[key.key_host] = {"requests": pool.num_requests, "new_connections": pool.num_connections}
+    with _lock:
+        for host, counts in _httpx_stats.items():
+            merged = stats.setdefault(host, {"requests": 0, "new_connections": 0})
+            merged["requests"] += counts["requests"]
+            merged["new_connections"] += counts["new_connections"]
+    for counts in stats.values():
+        counts["reused_connections"] = max(0, counts["requests"] - counts["new_connections"])
+    return stats
@@ -0,0 +1,238 @@
+#armazenamento das imagens por hash de conteúdo; o histórico guarda só a referência.
+#Com vários processos, as imagens que entram no histórico e as legendas também ficam no
+#Redis (IMAGE_STORE_BACKEND)
+import os
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORE_MAX_BYTES = int(os.getenv("IMAGE_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+IMAGE_INLINE_COUNT = int(os.getenv("IMAGE_INLINE_COUNT", "1"))  # imagens mais recentes enviadas inteiras
+IMAGE_SHARED_TTL = int(os.getenv("IMAGE_SHARED_TTL", os.getenv("SESSION_TTL", "3600")))  # vida no Redis, em segundos
+
+PLACEHOLDER_CAPTION = "imagem mostrada anteriormente"
+
+
+def image_ref_message(image_hash):
+    # Mensagem guardada no histórico no lugar do data URL
+    return {"role": "user", "content": [{"type": "image_ref", "image_ref": {"hash": image_hash}}]}
+
+
+def _image_ref_hash(message):
+    content = message.get("content")
+    if isinstance(content, list):
+        for part in content:
+            if part.get("type") == "image_ref":
+                return part["image_ref"]["hash"]
+    return None
+
+
+def last_image_hash(messages):
+    for message in reversed(messages):
+        image_hash = _image_ref_hash(message)
+        if image_hash:
+            return image_hash
+    return None
+
+
+# Camada compartilhada entre os processos (Redis ou compatível, com get/set(ex=, nx=)):
+# o histórico de uma sessão pode ser retomado por outro processo, que busca aqui as imagens
+# e legendas que não tem na memória. Falha no Redis só faz a imagem virar legenda
+class RedisImageTier:
+    def __init__(self, redis_client, ttl=IMAGE_SHARED_TTL, prefix="aivision:"):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _get(self, key):
+        try:
+            return self.redis.get(self.prefix + key)
+        except Exception as e:
+            logger.error(f"Erro ao ler {key[:20]} do Redis: {e}")
+            return None
+
+    def _set(self, key, value):
+        try:
+            # Conteúdo endereçado pelo hash: se já existe, é igual
+            self.redis.set(self.prefix + key, value, ex=self.ttl, nx=True)
+        except Exception as e:
+            logger.error(f"Erro ao gravar {key[:20]} no Redis: {e}")
+
+    def get(self, image_hash):
+        return self._get(f"image:{image_hash}")
+
+    def put(self, image_hash, image_bytes):
+        self._set(f"image:{image_hash}", image_bytes)
+
+    def get_caption(self, image_hash):
+        caption = self._get(f"caption:{image_hash}")
+        return caption.decode("utf-8") if isinstance(caption, bytes) else caption
+
+    def put_caption(self, image_hash, caption):
+        self._set(f"caption:{image_hash}", caption)
+
+
+def create_image_tier():
+    # IMAGE_STORE_BACKEND=redis compartilha as imagens entre os processos ("memory": só local)
+    if os.getenv("IMAGE_STORE_BACKEND", "memory").lower() == "redis":
+        from clients import redis_client
+        logger.info("Imagens compartilhadas pelo Redis.")
+        return RedisImageTier(redis_client())
+    return None
+
+
+class ImageStore:
+    def __init__(self, caption_fn=None, max_bytes=IMAGE_STORE_MAX_BYTES, inline_count=IMAGE_INLINE_COUNT, shared=None):
+        self.caption_fn = caption_fn  # (data_url) -> legenda curta
+        self.max_bytes = max_bytes
+        self.inline_count = inline_count
+        self.shared = shared  # RedisImageTier ou None
+        self._images = OrderedDict()  # hash -> [bytes JPEG, base64 ou None]
+        self._captions = {}  # só das imagens em _images: sai junto com a imagem
+        self._published = set()  # já enviadas à camada compartilhada (também saem com a imagem)
+        self._pending = set()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, image_bytes, encoded=None):
+        # encoded: base64 já disponível (ex.: o payload original do navegador), evita recodificar.
+        # Fica só na memória: o navegador manda um frame a cada rodada, e a maioria nunca entra
+        # no histórico (ver publish)
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        self._insert(image_hash, image_bytes, encoded)
+        return image_hash
+
+    def publish(self, image_hash):
+        # Envia a imagem à camada compartilhada quando o histórico passa a referenciá-la:
+        # só assim outro processo que retomar a conversa vai precisar dela
+        if self.shared is None:
+            return
+        with self._lock:
+            entry = self._images.get(image_hash)
+            if entry is None or image_hash in self._published:
+                return
+            self._published.add(image_hash)
+        self.shared.put(image_hash, entry[0])
+
+    def _insert(self, image_hash, image_bytes, encoded=None):
+        with self._lock:
+            if image_hash in self._images:
+                self._images.move_to_end(image_hash)
+                return
+            self._images[image_hash] = [image_bytes, encoded]
+            self._size += self._entry_size(self._images[image_hash])
+            while self._size > self.max_bytes and len(self._images) > 1:
+                old_hash, old_entry = self._images.popitem(last=False)
+                self._size -= self._entry_size(old_entry)
+                self._captions.pop(old_hash, None)
+                self._published.discard(old_hash)
+                logger.info(f"Imagem removida do armazenamento: {old_hash[:12]}")
+
+    @staticmethod
+    def _entry_size(entry):
+        return len(entry[0]) + len(entry[1] or "")
+
+    def _entry(self, image_hash):
+        with self._lock:
+            entry = self._images.get(image_hash)
+            if entry is not None:
+                self._images.move_to_end(image_hash)
+                return entry
+        # Imagem enviada a outro processo (sessão retomada aqui): traz do Redis para a memória
+        image_bytes = self.shared.get(image_hash) if self.shared is not None else None
+        if image_bytes is None:
+            return None
+        self._insert(image_hash, image_bytes)
+        with self._lock:
+            entry = self._images.get(image_hash)
+            if entry is not None:
+                self._published.add(image_hash)  # já está lá
+            return entry
+
+    def get(self, image_hash):
+        entry = self._entry(image_hash)
+        return entry[0] if entry else None
+
+    def __contains__(self, image_hash):
+        # Só a memória deste processo
+        return image_hash in self._images
+
+    def data_url(self, image_hash):
+        entry = self._entry(image_hash)
+        if entry is None:
+            return None
+        encoded = entry[1]
+        if encoded is None:
+            # Codifica uma única vez; as próximas requisições reaproveitam o base64
+            encoded = base64.b64encode(entry[0]).decode("utf-8")
+            with self._lock:
+                if self._images.get(image_hash) is entry and entry[1] is None:
+                    entry[1] = encoded
+                    self._size += len(encoded)
+        return f"data:image/jpeg;base64,{encoded}"
+
+    def caption(self, image_hash):
+        caption = self._captions.get(image_hash)
+        if caption is None and self.shared is not None:
+            caption = self.shared.get_caption(image_hash)
+            if caption is not None:
+                self._keep_caption(image_hash, caption)
+        if caption is None:
+            self._schedule_caption(image_hash)
+        return caption
+
+    def _keep_caption(self, image_hash, caption):
+        # Imagem já removida da memória: a legenda também não fica (no Redis, se houver, continua)
+        with self._lock:
+            if image_hash in self._images:
+                self._captions[image_hash] = caption
+
+    def _schedule_caption(self, image_hash):
+        if self.caption_fn is None:
+            return
+        with self._lock:
+            if image_hash in self._pending or image_hash not in self._images:
+                return
+            self._pending.add(image_hash)
+        threading.Thread(target=self._make_caption, args=(image_hash,), daemon=True).start()
+
+    def _make_caption(self, image_hash):
+        try:
+            data_url = self.data_url(image_hash)
+            if data_url:
+                caption = self.caption_fn(data_url)
+                self._keep_caption(image_hash, caption)
+                if self.shared is not None:
+                    self.shared.put_caption(image_hash, caption)
+        except Exception as e:
+            logger.error(f"Erro ao gerar legenda da imagem: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(image_hash)
+
+    def resolve(self, messages):
+        # Troca as referências pelas imagens: só as N mais recentes vão inteiras,
+        # as anteriores viram a legenda em texto
+        ref_positions = [i for i, message in enumerate(messages) if _image_ref_hash(message)]
+        inline = set(ref_positions[-self.inline_count:]) if self.inline_count > 0 else set()
+
+        resolved = []
+        for i, message in enumerate(messages):
+            image_hash = _image_ref_hash(message)
+            if image_hash is None:
+                resolved.append(message)
+                continue
+            data_url = self.data_url(image_hash) if i in inline else None
+            if data_url:
+                resolved.append({
+                    "role": "user",
+                    "content": [{"type": "image_url", "image_url": {"url": data_url}}],
+                })
+            else:
+                caption = self.caption(image_hash) or PLACEHOLDER_CAPTION
+                resolved.append({"role": "user", "content": f"[Imagem: {caption}]"})
+        return resolved
@@ -0,0 +1,111 @@
+#léxico de intenções: termos comparados por palavra inteira, sem acento e reduzidos ao radical
+#("veja" e "vejo" casam; "verdade" não casa com "ver"), em regexes compiladas uma vez na
+#inicialização. Termos com "=" casam só na forma escrita: o radical de "olha" é o de "olho",
+#e o de "vendo" é o de "vender"
+import os
+import re
+import json
+import logging
+import unicodedata
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+INTENT_LEXICON = os.getenv("INTENT_LEXICON", "")  # JSON {intenção: [termos]} que substitui o padrão
+MIN_STEM = 3
+EXACT = "="  # prefixo dos termos comparados sem reduzir ao radical
+
+# Terminações removidas pelo radicalizador, as mais longas primeiro
+SUFFIXES = ("ando", "endo", "indo", "ado", "ada", "ido", "ida", "ar", "er", "ir", "ou", "ei", "am", "em", "a", "e", "o")
+
+# "vision" e "search" são sinais fortes (o app resolve a ferramenta sozinho); "vision_hint"
+# só libera o uso da câmera caso o ChatGPT peça. Forte é só o pedido para olhar agora
+# (imperativo ou dêitico: "olha", "leia isso", "na minha mão"); substantivos e verbos soltos
+# ("câmera", "imagem", "ler") aparecem em qualquer conversa e ficam como dica. Termos curtos
+# ("cam" é o radical de "cama") ou de radical ambíguo ("placar" e "placa") ficam de fora, ou
+# entram com "="
+DEFAULT_LEXICON = {
+    "vision": [
+        "=olhar", "=olhe", "=olha", "=olhem", "=olhando", "=olhada", "veja", "vê",
+        "o que você vê", "=o que você está vendo", "=está vendo", "=tá vendo", "ver isso", "ver aqui",
+        "usa a câmera", "use a câmera", "tira uma foto", "tire uma foto", "descreva a imagem",
+        "descreve a imagem", "analise a imagem", "o que tem na imagem", "o que tem na foto",
+        "leia isso", "leia pra mim", "leia para mim", "leia o que", "leia esse", "leia este",
+        "leia essa", "leia esta", "na minha mão", "na minha frente",
+    ],
+    "vision_hint": [
+        "ver", "=vendo", "enxergar", "enxerga", "cena", "visão", "mostrar", "mostrando", "aparece",
+        "câmera", "webcam", "foto", "fotografia", "imagem", "picture", "ler",
+    ],
+    "search": [
+        "pesquisar", "pesquise", "pesquisa", "procurar", "procure", "buscar", "busque", "busca",
+        "na internet", "na web", "no google", "notícia", "quem ganhou", "cotação",
+    ],
+}
+
+
+def fold(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=8192)
+def stem(word):
+    # Radicalizador leve para o português: plural e terminações verbais/nominais comuns
+    if len(word) > 4 and word.endswith("ns"):
+        word = word[:-2] + "m"  # imagens -> imagem
+    elif len(word) > 3 and word.endswith("s"):
+        word = word[:-1]
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def fold_text(text):
+    return " ".join(re.findall(r"\w+", fold(text)))
+
+
+def stem_text(text):
+    return " ".join(stem(token) for token in re.findall(r"\w+", fold(text)))
+
+
+def _compile(phrases_by_intent):
+    # Um grupo nomeado por intenção; frases mais longas primeiro para ganharem na alternância
+    groups = []
+    for intent, phrases in phrases_by_intent.items():
+        phrases = sorted({phrase for phrase in phrases if phrase}, key=len, reverse=True)
+        if phrases:
+            groups.append(f"(?P<{intent}>{'|'.join(re.escape(p) for p in phrases)})")
+    return re.compile(r"(?<!\S)(?:" + "|".join(groups) + r")(?!\S)") if groups else None
+
+
+class IntentLexicon:
+    def __init__(self, lexicon=DEFAULT_LEXICON):
+        self.intents = list(lexicon)
+        self._stemmed = _compile({intent: [stem_text(term) for term in terms if not term.startswith(EXACT)]
+                                  for intent, terms in lexicon.items()})
+        self._exact = _compile({intent: [fold_text(term[len(EXACT):]) for term in terms if term.startswith(EXACT)]
+                                for intent, terms in lexicon.items()})
+
+    def match(self, text):
+        # Conjunto das intenções com algum termo presente no texto
+        matched = set()
+        if not text:
+            return matched
+        tokens = re.findall(r"\w+", fold(text))
+        if self._stemmed is not None:
+            matched.update(m.lastgroup for m in self._stemmed.finditer(" ".join(stem(token) for token in tokens)))
+        if self._exact is not None:
+            matched.update(m.lastgroup for m in self._exact.finditer(" ".join(tokens)))
+        return matched
+
+
+def load_lexicon(path=INTENT_LEXICON):
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return IntentLexicon(json.load(f))
+        except Exception as e:
+            logger.error(f"Erro ao carregar o léxico de intenções {path}: {e}")
+    return IntentLexicon()
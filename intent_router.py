@@ -0,0 +1,33 @@
+#roteador local de intenção: quando o pedido é claramente de visão ou de busca, o app anexa
+#a imagem ou roda a busca antes de chamar o ChatGPT, e a rodada custa uma única chamada.
+#Pedido ambíguo (nenhuma ou mais de uma intenção) continua pelas funções do ChatGPT
+import os
+
+from intent_lexicon import load_lexicon
+
+INTENT_FAST_PATH = os.getenv("INTENT_FAST_PATH", "1") == "1"
+
+VISION = "vision"
+VISION_HINT = "vision_hint"
+SEARCH = "search"
+
+# Compilado uma vez na inicialização (INTENT_LEXICON troca os termos)
+lexicon = load_lexicon()
+
+
+def route_intent(text, matched=None):
+    # Devolve a intenção quando só uma casa com o texto; senão None (decide o ChatGPT).
+    # Busca junto com qualquer sinal de visão, mesmo fraco, é ambígua: o atalho de busca
+    # desligaria as funções e o ChatGPT não poderia mais pedir a câmera
+    if not INTENT_FAST_PATH or not text:
+        return None
+    matched = lexicon.match(text) if matched is None else matched
+    if SEARCH in matched:
+        return None if matched & {VISION, VISION_HINT} else SEARCH
+    return VISION if VISION in matched else None
+
+
+def wants_image(text, matched=None):
+    # Libera a câmera para o ChatGPT: qualquer termo de visão, forte ou fraco
+    matched = lexicon.match(text) if matched is None else matched
+    return bool(matched & {VISION, VISION_HINT})
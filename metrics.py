@@ -0,0 +1,175 @@
+#métricas no formato texto do Prometheus (rota /metrics): histogramas de tempo por etapa da
+#rodada e por chamada externa, tamanho dos payloads, tokens consumidos e os contadores
+#que os caches e o pool HTTP já mantêm (lidos na hora da coleta)
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # rótulos -> [contagem por faixa..., soma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {values[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {values[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(dict(key))} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help):
+        metric = Counter(name, help)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        # fn() -> [(nome, tipo, ajuda, [(rótulos, valor), ...])], lido a cada coleta
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+TURN_SECONDS = registry.histogram("aivision_turn_seconds", "Duração de uma rodada completa.")
+STAGE_SECONDS = registry.histogram("aivision_stage_seconds", "Duração de cada etapa da rodada.")
+CALL_SECONDS = registry.histogram("aivision_call_seconds", "Duração das chamadas externas (STT, ChatGPT, funções, TTS).")
+PAYLOAD_BYTES = registry.histogram("aivision_payload_bytes", "Tamanho dos dados recebidos e enviados.", BYTES_BUCKETS)
+TOKENS = registry.counter("aivision_tokens_total", "Tokens consumidos no ChatGPT, por chamada e tipo.")
+UPSTREAM_WAIT_SECONDS = registry.histogram("aivision_upstream_wait_seconds", "Espera por orçamento (requisições/tokens) antes de chamar a API.")
+UPSTREAM_RETRIES = registry.counter("aivision_upstream_retries_total", "Novas tentativas após 429, 5xx ou falha de conexão.")
+TURNS = registry.counter("aivision_turns_total", "Rodadas por resultado (done, cancelled, busy, error).")
+
+
+def record_usage(call, usage):
+    # `usage` do SDK da OpenAI; cached = tokens do prefixo atendidos pelo cache de prompt
+    if usage is None:
+        return
+    TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, call=call, kind="prompt")
+    TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, call=call, kind="completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+    TOKENS.inc(cached or 0, call=call, kind="cached")
+
+
+def record_turn(graph):
+    # Reaproveita os tempos que o TurnGraph já mede
+    for name, (start, end) in graph.timings.items():
+        STAGE_SECONDS.observe((end - start) / 1000, stage=name)
+    TURN_SECONDS.observe(graph.elapsed_ms() / 1000)
+
+
+def turn_timings(graph):
+    # Payload do evento 'timings' enviado ao cliente
+    return {
+        "total_ms": round(graph.elapsed_ms(), 1),
+        "stages": {name: [round(start, 1), round(end, 1)] for name, (start, end) in graph.timings.items()},
+        "critical_path": graph.critical_path(),
+    }
+
+
+def messages_size(messages):
+    # Tamanho aproximado (caracteres) do que vai para o ChatGPT, sem serializar tudo em JSON
+    size = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            size += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                size += len(part.get("text") or part.get("image_url", {}).get("url", ""))
+    return size
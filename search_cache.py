@@ -0,0 +1,100 @@
+#cache das buscas na web: chave = consulta normalizada + localidade, TTL conforme o tipo
+#de pergunta, e buscas idênticas simultâneas compartilham uma única chamada (single-flight)
+import os
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TTL_NEWS = int(os.getenv("SEARCH_TTL_NEWS", "600"))  # notícias, placares, clima...
+SEARCH_TTL_STATIC = int(os.getenv("SEARCH_TTL_STATIC", "86400"))  # fatos que mudam pouco
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000"))
+
+# Termos que indicam informação que muda rápido (comparados sem acento)
+NEWS_TERMS = re.compile(
+    r"\b(hoje|agora|ontem|amanha|noticias?|ultimas?|ultimos?|atual|atualize|placar|ao vivo|"
+    r"previsao|tempo|clima|cotacao|dolar|resultado|jogo|semana|news|today)\b"
+)
+
+
+def normalize_query(query):
+    text = unicodedata.normalize("NFKD", query.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def query_ttl(normalized_query):
+    return SEARCH_TTL_NEWS if NEWS_TERMS.search(normalized_query) else SEARCH_TTL_STATIC
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+
+
+class SearchCache:
+    def __init__(self, max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl_fn=query_ttl):
+        self.max_entries = max_entries
+        self.ttl_fn = ttl_fn
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()  # chave -> (expira_em, resultado)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, query, fetch, gl="", hl=""):
+        normalized = normalize_query(query)
+        key = (normalized, gl, hl)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Outra requisição já está buscando a mesma coisa: espera o resultado dela
+            flight.done.wait()
+            if flight.abandoned:
+                return self.get_or_fetch(query, fetch, gl, hl)
+            if flight.error:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            if flight.result:
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + self.ttl_fn(normalized), flight.result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        except BaseException:
+            # Líder interrompido (eventlet.Timeout, rodada cancelada): a busca em si não falhou.
+            # Quem esperava tenta de novo, e um deles vira o novo líder
+            flight.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
@@ -0,0 +1,123 @@
+#orquestrador das buscas: dispara o backend mais rápido, manda uma requisição de reserva
+#(hedge) para o outro se o primeiro demorar, fica com o primeiro resultado bom e cancela o resto
+import os
+import time
+import logging
+
+import eventlet
+from eventlet.queue import Queue, Empty
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "6"))  # prazo total da busca, em segundos
+SEARCH_HEDGE_DELAY = float(os.getenv("SEARCH_HEDGE_DELAY", "1.5"))  # espera antes do hedge
+EWMA_ALPHA = 0.2
+
+
+class BackendStats:
+    def __init__(self, name):
+        self.name = name
+        self.latency = None  # média móvel exponencial, em segundos
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, latency, ok):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if latency is not None:
+            self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+
+    def score(self):
+        # Menor é melhor. Backends com latência medida vêm antes dos ainda não testados (estes
+        # na ordem configurada, que é a do sorted estável); sem resposta boa e só com erros, por
+        # último. Um backend novo só é experimentado pelo hedge ou quando os outros falham
+        if self.latency is None:
+            return (2, 0.0) if self.errors else (1, 0.0)
+        return (0, self.latency * (1 + 4 * self.error_rate))
+
+
+class SearchOrchestrator:
+    def __init__(self, backends, deadline=SEARCH_DEADLINE, hedge_delay=SEARCH_HEDGE_DELAY):
+        self.backends = list(backends)  # [(nome, função(query) -> resultado ou None)]
+        self.deadline = deadline
+        self.hedge_delay = hedge_delay
+        self.stats = {name: BackendStats(name) for name, _ in self.backends}
+
+    def ranked_backends(self):
+        # sorted é estável: empate mantém a ordem original (o primário configurado)
+        return sorted(self.backends, key=lambda backend: self.stats[backend[0]].score())
+
+    def _run(self, name, fn, query, results):
+        start = time.perf_counter()
+        try:
+            result = fn(query)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        # Falha rápida não pode parecer backend rápido: só respostas boas entram na latência
+        latency = time.perf_counter() - start if result else None
+        self.stats[name].record(latency, ok=bool(result))
+        results.put((name, result, error))
+
+    def search(self, query):
+        started_at = time.perf_counter()
+        deadline = started_at + self.deadline
+        pending = list(self.ranked_backends())
+        results = Queue()
+        running = {}
+
+        def launch():
+            name, fn = pending.pop(0)
+            running[name] = (eventlet.spawn(self._run, name, fn, query, results), time.perf_counter())
+            logger.info(f"Busca '{query}' enviada para {name}")
+
+        launch()
+        winner = None
+        try:
+            while running:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                # Com backend de reserva disponível, só espera até o momento do hedge
+                timeout = deadline - now
+                if pending:
+                    timeout = min(timeout, self.hedge_delay)
+                try:
+                    name, result, error = results.get(timeout=timeout)
+                except Empty:
+                    if pending:
+                        logger.info("Backend primário lento; enviando busca de reserva.")
+                        launch()
+                    continue
+
+                running.pop(name, None)
+                if result:
+                    winner = name
+                    logger.info(f"Busca respondida por {name} em {time.perf_counter() - started_at:.2f}s")
+                    return result
+                logger.warning(f"Busca sem resultado em {name}: {error}")
+                # Falha rápida: não espera o hedge para tentar o próximo
+                if pending:
+                    launch()
+            logger.error(f"Nenhum backend de busca respondeu para '{query}'")
+            return None
+        finally:
+            # Cancela quem ainda está rodando; a latência conta pelo menos o tempo já gasto.
+            # Perder a corrida não é erro, estourar o prazo sem resposta é
+            for name, (thread, launched_at) in running.items():
+                thread.kill()
+                self.stats[name].record(time.perf_counter() - launched_at, ok=winner is not None)
+
+    def report(self):
+        return {
+            name: {
+                "latency": stats.latency,
+                "error_rate": stats.error_rate,
+                "calls": stats.calls,
+                "errors": stats.errors,
+            }
+            for name, stats in self.stats.items()
+        }
@@ -0,0 +1,108 @@
+#normalização dos resultados de busca: os dois backends viram o mesmo formato, sem URLs
+#repetidas, ordenados pela relevância para a pergunta e cortados num orçamento de tokens
+import os
+import re
+import unicodedata
+from urllib.parse import urlsplit
+
+from context_window import count_text_tokens
+
+SEARCH_RESULT_TOKEN_BUDGET = int(os.getenv("SEARCH_RESULT_TOKEN_BUDGET", "350"))
+SNIPPET_MAX_CHARS = 300
+
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "de", "da", "do", "das", "dos", "e", "em", "no", "na",
+    "nos", "nas", "para", "por", "com", "que", "qual", "quais", "quem", "como", "se", "sobre",
+    "the", "of", "and", "to", "in", "is", "me", "meu", "minha",
+}
+
+
+def result_item(title="", url="", snippet="", source="", priority=0):
+    return {"title": title or "", "url": url or "", "snippet": snippet or "", "source": source, "priority": priority}
+
+
+def _terms(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in re.findall(r"\w+", text) if t not in STOPWORDS and len(t) > 1]
+
+
+def _url_key(url):
+    parts = urlsplit(url)
+    host = parts.netloc.lower().removeprefix("www.")
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def _domain(url):
+    return urlsplit(url).netloc.lower().removeprefix("www.")
+
+
+def _flatten(value):
+    if isinstance(value, list):
+        return "; ".join(_flatten(v) for v in value if v)
+    if isinstance(value, dict):
+        return "; ".join(f"{k}: {_flatten(v)}" for k, v in value.items() if isinstance(v, (str, int, float)))
+    return str(value)
+
+
+def from_serpapi(results):
+    items = []
+    answer_box = results.get("answer_box")
+    if answer_box:
+        answer = answer_box.get("answer") or answer_box.get("result") or answer_box.get("snippet")
+        if not answer:
+            answer = _flatten({k: v for k, v in answer_box.items() if k not in ("type", "thumbnail")})
+        items.append(result_item(answer_box.get("title"), answer_box.get("link"), answer, "answer_box", priority=2))
+
+    local_results = results.get("local_results") or []
+    if isinstance(local_results, dict):
+        local_results = local_results.get("places", [])
+    for place in local_results[:5]:
+        details = ", ".join(str(place[k]) for k in ("type", "address", "rating", "hours") if place.get(k))
+        items.append(result_item(place.get("title"), place.get("website") or place.get("link"), details, "local", priority=1))
+
+    for result in results.get("organic_results", []):
+        items.append(result_item(result.get("title"), result.get("link"), result.get("snippet"), "organic"))
+    return items
+
+
+def from_custom_search(results):
+    return [
+        result_item(item.get("title"), item.get("link"), item.get("snippet"), "organic")
+        for item in results.get("items", [])
+    ]
+
+
+def rank_results(query, items):
+    # Remove URLs repetidas (fica a de maior prioridade) e ordena por prioridade e
+    # pela fração dos termos da pergunta presentes no título e no trecho
+    query_terms = set(_terms(query))
+    seen = set()
+    ranked = []
+    for position, item in enumerate(sorted(items, key=lambda i: -i["priority"])):
+        key = _url_key(item["url"]) if item["url"] else f"sem-url-{position}"
+        if key in seen or not (item["snippet"] or item["title"]):
+            continue
+        seen.add(key)
+        item_terms = set(_terms(f"{item['title']} {item['snippet']}"))
+        overlap = len(query_terms & item_terms) / len(query_terms) if query_terms else 0.0
+        ranked.append((item["priority"], overlap, -position, item))
+    ranked.sort(key=lambda r: r[:3], reverse=True)
+    return [item for *_, item in ranked]
+
+
+def build_payload(query, items, token_budget=SEARCH_RESULT_TOKEN_BUDGET):
+    # Texto mínimo para o ChatGPT: uma linha por resultado, até o orçamento de tokens
+    lines = []
+    used = 0
+    for item in rank_results(query, items):
+        snippet = re.sub(r"\s+", " ", item["snippet"]).strip()[:SNIPPET_MAX_CHARS]
+        line = f"- {item['title']}: {snippet}" if item["title"] else f"- {snippet}"
+        if item["url"]:
+            line += f" ({_domain(item['url'])})"
+        tokens = count_text_tokens(line)
+        if lines and used + tokens > token_budget:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines) or None
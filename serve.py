@@ -0,0 +1,102 @@
+#modo de produção: vários processos do app, cada um na sua porta (--port, --port+1, ...), atrás
+#de um balanceador com sessões fixas (o Socket.IO por polling faz várias requisições por
+#conexão, todas têm de chegar ao mesmo processo). Exemplo com nginx:
+#   upstream aivision { ip_hash; server 127.0.0.1:5000; server 127.0.0.1:5001; }
+#   location / { proxy_pass http://aivision; proxy_http_version 1.1;
+#                proxy_set_header Upgrade $http_upgrade; proxy_set_header Connection "upgrade"; }
+#Com mais de um processo, sessões, imagens e a fila de mensagens do Socket.IO ficam no Redis
+#(REDIS_URL); nos testes, benchmarks/mini_redis.py faz as vezes do Redis
+#uso: python serve.py --workers 4 [--host 0.0.0.0] [--port 5000] [--certfile cert.pem --keyfile key.pem]
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import subprocess
+
+from dotenv import load_dotenv
+
+# O .env.local vale também para o supervisor: o REDIS_URL de lá tem de chegar aos processos
+# antes do padrão de shared_env
+load_dotenv(dotenv_path=".env.local")
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def shared_env(workers):
+    # Um processo só pode guardar tudo na memória; vários dividem o estado pelo Redis.
+    # Variáveis já definidas no ambiente têm precedência
+    env = dict(os.environ)
+    if workers > 1:
+        redis_url = env.setdefault("REDIS_URL", "redis://localhost:6379/0")
+        env.setdefault("SESSION_BACKEND", "redis")
+        env.setdefault("IMAGE_STORE_BACKEND", "redis")
+        env.setdefault("SOCKETIO_MESSAGE_QUEUE", redis_url)
+    return env
+
+
+def run_worker(args):
+    import app
+
+    app.warm_up()
+    tls = {"certfile": args.certfile, "keyfile": args.keyfile} if args.certfile else {}
+    app.socketio.run(app.app, host=args.host, port=args.port, debug=False, use_reloader=False,
+                     log_output=False, **tls)
+
+
+def supervise(args):
+    env = shared_env(args.workers)
+    if args.workers > 1:
+        logger.info(f"{args.workers} processos com estado compartilhado em {env['REDIS_URL']}")
+
+    def start(index):
+        command = [sys.executable, os.path.abspath(__file__), "--worker", f"--host={args.host}",
+                   f"--port={args.port + index}"]
+        if args.certfile:
+            command += [f"--certfile={args.certfile}", f"--keyfile={args.keyfile}"]
+        logger.info(f"Processo {index} na porta {args.port + index}")
+        return subprocess.Popen(command, env=env)
+
+    processes = {index: start(index) for index in range(args.workers)}
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+    try:
+        # Processo que cai é reiniciado na mesma porta; os clientes dele reconectam e, com o
+        # identificador da conversa, continuam de onde pararam
+        while not stopping:
+            for index, process in list(processes.items()):
+                code = process.poll()
+                if code is not None:
+                    logger.error(f"Processo {index} saiu com código {code}; reiniciando.")
+                    processes[index] = start(index)
+            time.sleep(1)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000, help="porta do primeiro processo")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args)
+    else:
+        supervise(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#armazenamento do estado de conversa por sessão (request.sid)
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))  # segundos sem atividade
+
+
+def new_session_state():
+    # Estado inicial de uma conversa: histórico (sem o prompt de sistema), tokens de cada
+    # mensagem, resumo das mensagens já descartadas e quantas foram descartadas
+    return {"history": [], "tokens": [], "summary": "", "base": 0}
+
+
+# Backend em memória do processo, com despejo LRU e expiração por TTL
+class MemorySessionStore:
+    def __init__(self, max_entries=SESSION_MAX_ENTRIES, ttl=SESSION_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # sid -> (expira_em, estado)
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            expires_at, state = item
+            if expires_at < time.monotonic():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return state
+
+    def set(self, sid, state):
+        with self._lock:
+            self._data[sid] = (time.monotonic() + self.ttl, state)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_entries:
+                old_sid, _ = self._data.popitem(last=False)
+                logger.info(f"Sessão removida por LRU: {old_sid}")
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Backend compatível com Redis: recebe qualquer cliente com get/set(ex=)/delete,
+# o que permite trocar o Redis real por um fake local nos testes
+class RedisSessionStore:
+    def __init__(self, redis_client, ttl=SESSION_TTL, prefix="aivision:session:"):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, sid):
+        return f"{self.prefix}{sid}"
+
+    def get(self, sid):
+        raw = self.redis.get(self._key(sid))
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return json.loads(raw)
+
+    def set(self, sid, state):
+        self.redis.set(self._key(sid), json.dumps(state, ensure_ascii=False), ex=self.ttl)
+
+    def delete(self, sid):
+        self.redis.delete(self._key(sid))
+
+
+def create_session_store():
+    # Escolhe o backend pela variável SESSION_BACKEND ("memory" ou "redis")
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    if backend == "redis":
+        from clients import redis_client
+        logger.info("Sessões guardadas no Redis.")
+        return RedisSessionStore(redis_client())
+    return MemorySessionStore()
@@ -0,0 +1,85 @@
+#síntese de voz em streaming: o texto do ChatGPT é dividido em frases e cada frase
+#vira um trecho de áudio assim que fica completa
+import re
+import logging
+
+import eventlet
+from eventlet.queue import Queue
+
+logger = logging.getLogger(__name__)
+
+# Fim de frase: pontuação seguida de espaço (ou quebra de linha)
+SENTENCE_END = re.compile(r"(?<=[.!?…:;])\s+|\n+")
+MIN_SENTENCE_CHARS = 20  # frases muito curtas são juntadas à seguinte
+
+
+class SentenceSplitter:
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        # Devolve as frases completas acumuladas até agora
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
+
+class SpeechStream:
+    def __init__(self, synthesize, emit_chunk):
+        self.synthesize = synthesize  # (texto) -> bytes de áudio ou None
+        self.emit_chunk = emit_chunk  # (seq, texto, áudio) -> None
+        self.splitter = SentenceSplitter()
+        self._seq = 0
+        self._queue = Queue()
+        self._jobs = []
+        self._emitter = eventlet.spawn(self._emit_in_order)
+
+    def add_text(self, text):
+        for sentence in self.splitter.feed(text):
+            self._synthesize(sentence)
+
+    def _synthesize(self, sentence):
+        # Cada frase é sintetizada em paralelo; o emissor respeita a ordem original
+        job = eventlet.spawn(self.synthesize, sentence)
+        self._jobs.append(job)
+        self._queue.put((self._seq, sentence, job))
+        self._seq += 1
+
+    def _emit_in_order(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            seq, sentence, job = item
+            audio = job.wait()
+            if audio is None:
+                logger.error(f"Erro ao sintetizar o trecho {seq}.")
+            self.emit_chunk(seq, sentence, audio)
+
+    def finish(self):
+        # Sintetiza o resto do texto e espera todos os trechos serem enviados
+        for sentence in self.splitter.flush():
+            self._synthesize(sentence)
+        self._queue.put(None)
+        self._emitter.wait()
+        return self._seq
+
+    def abort(self):
+        # Interrompe o envio (ex.: erro no ChatGPT ou rodada cancelada); trechos pendentes
+        # são descartados e as sínteses ainda em andamento, interrompidas
+        self._emitter.kill()
+        for job in self._jobs:
+            job.kill()
@@ -0,0 +1,149 @@
+#transcrição em tempo real: o áudio chega em trechos durante a gravação e o texto
+#final fica pronto logo depois que o usuário para de falar
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+STT_BACKEND = os.getenv("STT_BACKEND", "deepgram")  # "deepgram" ou "buffered"
+STT_FINISH_TIMEOUT = float(os.getenv("STT_FINISH_TIMEOUT", "5"))
+
+
+# Sessão de streaming no Deepgram (websocket); o container (webm/ogg) é detectado por eles
+class DeepgramLiveSession:
+    def __init__(self, deepgram, mimetype, language):
+        from deepgram import LiveOptions, LiveTranscriptionEvents
+
+        self._parts = []
+        self._finalized = threading.Event()
+        self._connection = deepgram.listen.websocket.v("1")
+        self._connection.on(LiveTranscriptionEvents.Transcript, self._on_transcript)
+        options = LiveOptions(model="nova-2", language=language, smart_format=True)
+        if not self._connection.start(options):
+            raise RuntimeError("Não foi possível abrir a transcrição em tempo real no Deepgram")
+
+    def _on_transcript(self, client, result, **kwargs):
+        if result.is_final:
+            text = result.channel.alternatives[0].transcript
+            if text:
+                self._parts.append(text)
+        # Resposta ao Finalize: o áudio enviado até ali já foi todo transcrito
+        if getattr(result, "from_finalize", False):
+            self._finalized.set()
+
+    def send(self, chunk):
+        self._connection.send(chunk)
+
+    def finish(self, timeout=STT_FINISH_TIMEOUT):
+        # Pede ao Deepgram que transcreva o que ainda está no buffer e espera o resultado antes
+        # de fechar: o finish() do SDK só espera um intervalo fixo e pode perder as últimas palavras
+        if self._connection.finalize() and not self._finalized.wait(timeout):
+            logger.warning("Deepgram não confirmou o Finalize no prazo.")
+        self._connection.finish()
+        return " ".join(self._parts) or None
+
+    def abort(self):
+        self._connection.finish()
+
+
+class DeepgramLiveSTT:
+    def __init__(self, deepgram_client):
+        self.deepgram_client = deepgram_client  # fábrica: o SDK só é carregado na primeira sessão
+
+    def open(self, mimetype, language):
+        return DeepgramLiveSession(self.deepgram_client(), mimetype, language)
+
+
+# Substituto local: junta os trechos e transcreve tudo no final com qualquer função
+# (bytes, mimetype, language) -> texto; útil em testes e sem acesso ao streaming
+class BufferedSession:
+    def __init__(self, transcribe_fn, mimetype, language):
+        self.transcribe_fn = transcribe_fn
+        self.mimetype = mimetype
+        self.language = language
+        self._chunks = []
+
+    def send(self, chunk):
+        self._chunks.append(chunk)
+
+    def finish(self):
+        return self.transcribe_fn(b"".join(self._chunks), mimetype=self.mimetype, language=self.language)
+
+    def abort(self):
+        self._chunks = []
+
+
+class BufferedSTT:
+    def __init__(self, transcribe_fn):
+        self.transcribe_fn = transcribe_fn
+
+    def open(self, mimetype, language):
+        return BufferedSession(self.transcribe_fn, mimetype, language)
+
+
+class LiveTranscription:
+    """Recebe os trechos numerados do cliente e repassa ao backend na ordem certa."""
+
+    def __init__(self, session=None):
+        # Sem sessão, os trechos ficam guardados até attach(): abrir o backend leva um
+        # tempo (websocket do Deepgram) e os primeiros trechos já podem estar chegando
+        self.session = session
+        self._next_seq = 0
+        self._pending = {}
+        self._aborted = False
+        self._cond = threading.Condition()
+
+    def attach(self, session):
+        with self._cond:
+            if not self._aborted:
+                self.session = session
+                self._flush()
+                self._cond.notify_all()
+                return
+        # Cancelada enquanto o backend abria
+        session.abort()
+
+    def add_chunk(self, seq, chunk):
+        # Os eventos do Socket.IO podem ser tratados fora de ordem
+        with self._cond:
+            if self._aborted:
+                return
+            self._pending[seq] = chunk
+            if self.session is not None:
+                self._flush()
+            self._cond.notify_all()
+
+    def _flush(self):
+        while self._next_seq in self._pending:
+            self.session.send(self._pending.pop(self._next_seq))
+            self._next_seq += 1
+
+    def finish(self, total_chunks, timeout=STT_FINISH_TIMEOUT):
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: self._aborted or (self.session is not None and self._next_seq >= total_chunks), timeout):
+                logger.warning(f"Transcrição finalizada com {self._next_seq} de {total_chunks} trechos.")
+            session = None if self._aborted else self.session
+        if session is None:
+            return None
+        return session.finish()
+
+    def abort(self):
+        with self._cond:
+            self._aborted = True
+            self._pending = {}
+            session = self.session
+            self._cond.notify_all()
+        if session is None:
+            return
+        try:
+            session.abort()
+        except Exception as e:
+            logger.error(f"Erro ao encerrar a transcrição: {e}")
+
+
+def create_stt(deepgram_client, transcribe_fn):
+    if STT_BACKEND == "buffered":
+        return BufferedSTT(transcribe_fn)
+    return DeepgramLiveSTT(deepgram_client)
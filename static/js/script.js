@@ -11,6 +11,13 @@ let audioChunks = [];
 let recorder = null;
 let isRecording = false;
 let playAudioResponse = true;
+let streamResponse = true; // recebe a resposta em trechos de áudio, frase a frase
+let liveTranscription = true; // envia o áudio em trechos durante a gravação
+let showTimings = false; // pede ao servidor os tempos de cada etapa da rodada (evento 'timings')
+let chunkSeq = 0;
+let chunkSending = Promise.resolve();
+let audioQueue = [];
+let audioPlaying = false;
 
 // Conexão com o servidor via Socket.IO
 // const socket = io('https://engperini.ddns.net:5505', {
@@ -18,8 +25,16 @@ let playAudioResponse = true;
 //     rejectUnauthorized: false
 // });
 
-//const socket = io('192.168.0.21:5000');
-const socket = io('https://engperini.ddns.net:5505');
+// Identificador da conversa, guardado no navegador: ao reconectar (em qualquer processo do
+// servidor) a conversa continua de onde parou
+let conversationId = localStorage.getItem('conversationId');
+if (!conversationId) {
+    conversationId = crypto.randomUUID();
+    localStorage.setItem('conversationId', conversationId);
+}
+
+//const socket = io('192.168.0.21:5000', { auth: { conversation: conversationId } });
+const socket = io('https://engperini.ddns.net:5505', { auth: { conversation: conversationId } });
 
 socket.on('connect', () => {
     console.log('Conectado ao servidor via Socket.IO');
@@ -32,6 +47,74 @@ socket.on('disconnect', () => {
 });
 
 socket.on('response', (data) => {
+    // Protocolo antigo: áudio em base64
+    let audioBlob = null;
+    if (data.audio) {
+        const audioBytes = atob(data.audio);
+        const audioBuffer = new Uint8Array(audioBytes.length);
+        for (let i = 0; i < audioBytes.length; i++) {
+            audioBuffer[i] = audioBytes.charCodeAt(i);
+        }
+        audioBlob = new Blob([audioBuffer], { type: 'audio/mp3' });
+    }
+    handleResponse(data, audioBlob);
+});
+
+socket.on('response_bin', (data) => {
+    // Protocolo binário: o áudio já chega como ArrayBuffer
+    const audioBlob = data.audio ? new Blob([data.audio], { type: 'audio/mp3' }) : null;
+    handleResponse(data, audioBlob);
+});
+
+// Modo streaming: cada trecho de áudio entra na fila e é tocado em ordem
+socket.on('response_chunk', (data) => {
+    status.textContent = 'Respondendo...';
+    if (!data.audio) {
+        return;
+    }
+    let audioBlob;
+    if (typeof data.audio === 'string') {
+        const audioBytes = atob(data.audio);
+        const audioBuffer = new Uint8Array(audioBytes.length);
+        for (let i = 0; i < audioBytes.length; i++) {
+            audioBuffer[i] = audioBytes.charCodeAt(i);
+        }
+        audioBlob = new Blob([audioBuffer], { type: 'audio/mp3' });
+    } else {
+        audioBlob = new Blob([data.audio], { type: 'audio/mp3' });
+    }
+    audioQueue.push(audioBlob);
+    if (playAudioResponse && !audioPlaying) {
+        playNextChunk();
+    }
+});
+
+socket.on('response_end', (data) => {
+    status.textContent = 'Resposta recebida do servidor.';
+    console.log(data.text);
+    displayBotMessage(data.text);
+});
+
+function playNextChunk() {
+    const audioBlob = audioQueue.shift();
+    if (!audioBlob) {
+        audioPlaying = false;
+        return;
+    }
+    audioPlaying = true;
+    const url = URL.createObjectURL(audioBlob);
+    responseAudio.src = url;
+    responseAudio.play();
+}
+
+responseAudio.addEventListener('ended', () => {
+    URL.revokeObjectURL(responseAudio.src);
+    if (audioPlaying) {
+        playNextChunk();
+    }
+});
+
+function handleResponse(data, audioBlob) {
     status.textContent = 'Resposta recebida do servidor.';
     
     // Exibe a resposta do bot no chat
@@ -39,14 +122,8 @@ socket.on('response', (data) => {
     displayBotMessage(data.text); 
 
     // Reproduz o áudio de resposta
-    if (playAudioResponse && data.audio) {
-        const audioBytes = atob(data.audio);
-        const audioBuffer = new Uint8Array(audioBytes.length);
-        for (let i = 0; i < audioBytes.length; i++) {
-            audioBuffer[i] = audioBytes.charCodeAt(i);
-        }
-        const blob = new Blob([audioBuffer], { type: 'audio/mp3' });
-        const url = URL.createObjectURL(blob);
+    if (playAudioResponse && audioBlob) {
+        const url = URL.createObjectURL(audioBlob);
         responseAudio.src = url;
         responseAudio.play();
     }
@@ -58,6 +135,26 @@ socket.on('response', (data) => {
     } else {
         responseImage.style.display = 'none';
     }
+}
+
+socket.on('timings', (data) => {
+    console.log(`Rodada em ${data.total_ms} ms, caminho crítico: ${data.critical_path.join(' -> ')}`);
+    console.table(data.stages);
+});
+
+// A rodada anterior foi substituída por uma mensagem mais nova: o áudio dela que ainda
+// está na fila não é mais tocado
+socket.on('cancelled', () => {
+    audioQueue = [];
+    if (audioPlaying) {
+        audioPlaying = false;
+        responseAudio.pause();
+    }
+});
+
+socket.on('busy', (data) => {
+    console.warn('Servidor ocupado:', data.error);
+    status.textContent = 'Servidor ocupado, tente novamente em instantes.';
 });
 
 socket.on('error', (error) => {
@@ -83,15 +180,28 @@ talkButton.onclick = async () => {
             //mediaStream = await navigator.mediaDevices.getUserMedia({ video: true, audio: true });
             //localVideo.srcObject = mediaStream;
 
-            recorder = new MediaRecorder(mediaStream);
+            // Grava só as faixas de áudio; o frame da câmera vai separado
+            recorder = new MediaRecorder(new MediaStream(mediaStream.getAudioTracks()));
+            if (liveTranscription) {
+                chunkSeq = 0;
+                socket.emit('audio_start', { mimetype: recorder.mimeType });
+            }
             recorder.ondataavailable = event => {
-                audioChunks.push(event.data);
+                if (liveTranscription) {
+                    // Envia cada trecho assim que fica pronto, mantendo a numeração em ordem
+                    const seq = chunkSeq++;
+                    chunkSending = chunkSending.then(async () => {
+                        socket.emit('audio_chunk', { seq: seq, audio: await event.data.arrayBuffer() });
+                    });
+                } else {
+                    audioChunks.push(event.data);
+                }
             };
             recorder.onstop = () => {
                 console.log('Gravação de áudio finalizada.');
                 sendData(true);
             };
-            recorder.start();
+            recorder.start(liveTranscription ? 250 : undefined);
 
             isRecording = true;
             talkButton.textContent = 'Send';
@@ -119,59 +229,53 @@ sendButton.onclick = () => {
 };
 
 const sendData = async (sendAudio) => {
-    // Cria um blob do áudio gravado
-    let audioBlob = null;
-    if (sendAudio) {
-        audioBlob = new Blob(audioChunks, { type: 'audio/wav' });
+    // Prepara os dados para envio; áudio e imagem vão como binário (ArrayBuffer)
+    let data = { stream: streamResponse, timings: showTimings };
+
+    if (sendAudio && liveTranscription) {
+        // O áudio já foi enviado em trechos; espera o último sair antes de finalizar
+        await chunkSending;
+        data.chunks = chunkSeq;
+    } else if (sendAudio) {
+        const audioBlob = new Blob(audioChunks, { type: recorder.mimeType || 'audio/wav' });
         audioChunks = [];
+        data.audio = await audioBlob.arrayBuffer();
+        data.audio_mimetype = audioBlob.type;
+    } else {
+        data.text = sendText.value;
+        sendText.value = "";
     }
 
     // Captura um frame do vídeo
-    let videoDataUrl = null;
     if (mediaStream && mediaStream.getVideoTracks().length > 0) {
         const videoTrack = mediaStream.getVideoTracks()[0];
         const imageCapture = new ImageCapture(videoTrack);
         try {
             const bitmap = await imageCapture.grabFrame();
-            // Converte o frame para DataURL
+            // Converte o frame para JPEG
             const canvas = document.createElement('canvas');
             canvas.width = bitmap.width;
             canvas.height = bitmap.height;
             const ctx = canvas.getContext('2d');
             ctx.drawImage(bitmap, 0, 0);
-            videoDataUrl = canvas.toDataURL('image/jpeg');
+            const videoBlob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg'));
+            if (videoBlob) {
+                data.video = await videoBlob.arrayBuffer();
+            }
         } catch (err) {
             console.error('Erro ao capturar frame de vídeo:', err);
         }
     }
 
-    // Prepara os dados para envio
-    let data = {};
-    
-    if (sendAudio) {
-        // Converte o áudio em base64
-        const reader = new FileReader();
-        reader.onload = function() {
-            const base64Audio = reader.result; // Data URL do áudio
-            data.audio = base64Audio;
-            if (videoDataUrl) {
-                data.video = videoDataUrl;
-            }
-            sendDataToServer(data);
-        };
-        reader.readAsDataURL(audioBlob);
+    if (sendAudio && liveTranscription) {
+        socket.emit('audio_end', data);
     } else {
-        data.text = sendText.value;
-        sendText.value = "";
-        if (videoDataUrl) {
-            data.video = videoDataUrl;
-        }
         sendDataToServer(data);
     }
 };
 
 function sendDataToServer(data) {
-    socket.emit('process_data', data);
+    socket.emit('process_data_bin', data);
 }
 
 function displayUserMessage(message) {
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from context_window import ContextManager
+from session_store import MemorySessionStore, RedisSessionStore
+
+SYSTEM = {"role": "system", "content": "Você é um assistente."}
+
+
+def wait_for_summaries(context, timeout=5):
+    deadline = time.monotonic() + timeout
+    while context._pending:
+        assert time.monotonic() < deadline, "resumo não terminou"
+        time.sleep(0.01)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request, fake_redis):
+    if request.param == "redis":
+        return RedisSessionStore(fake_redis)
+    return MemorySessionStore()
+
+
+def test_summary_merges_into_turn_save(store):
+    calls = []
+
+    def summarize(previous, transcript):
+        calls.append((previous, transcript))
+        return f"resumo {len(calls)}"
+
+    context = ContextManager(SYSTEM, summarize, store, token_budget=100_000, max_turns=2)
+    for i in range(6):
+        state = context.load("conversa")
+        context.append(state, {"role": "user", "content": f"pergunta {i}"})
+        context.build_messages("conversa", state)
+        context.append(state, {"role": "assistant", "content": f"resposta {i}"})
+        # O resumo termina no meio da rodada, com a cópia dela ainda por salvar
+        wait_for_summaries(context)
+        context.save("conversa", state)
+
+    state = context.load("conversa")
+    assert state["base"] == 8
+    assert [m["content"] for m in state["history"]] == ["pergunta 4", "resposta 4", "pergunta 5", "resposta 5"]
+    assert len(state["tokens"]) == len(state["history"])
+    assert state["summary"] == "resumo 4"
+    # Cada rodada antiga é resumida uma única vez, encadeando o resumo anterior
+    assert [transcript for _, transcript in calls] == [
+        f"user: pergunta {i}\nassistant: resposta {i}" for i in range(4)
+    ]
+    assert [previous for previous, _ in calls] == ["", "resumo 1", "resumo 2", "resumo 3"]
+
+
+def test_summary_finished_after_save_applies_on_load(store):
+    context = ContextManager(SYSTEM, lambda previous, transcript: "resumo", store, token_budget=100_000, max_turns=1)
+    state = context.load("conversa")
+    for i in range(2):
+        context.append(state, {"role": "user", "content": f"pergunta {i}"})
+        context.append(state, {"role": "assistant", "content": f"resposta {i}"})
+    context.save("conversa", state)
+
+    messages = context.build_messages("conversa", state)
+    assert [m["content"] for m in messages[1:]] == ["pergunta 1", "resposta 1"]
+    wait_for_summaries(context)
+
+    state = context.load("conversa")
+    assert state["base"] == 2
+    assert state["summary"] == "resumo"
+    assert context.build_messages("conversa", state)[1]["content"] == "Resumo da conversa até aqui: resumo"
+
+
+def test_delete_drops_summary(store):
+    context = ContextManager(SYSTEM, lambda previous, transcript: "resumo", store, max_turns=1)
+    state = context.load("conversa")
+    for i in range(2):
+        context.append(state, {"role": "user", "content": f"pergunta {i}"})
+    context.save("conversa", state)
+    context.build_messages("conversa", state)
+    wait_for_summaries(context)
+
+    context.delete("conversa")
+    assert context.load("conversa") == {"history": [], "tokens": [], "summary": "", "base": 0}
+
+
+def test_window_matches_request(store):
+    context = ContextManager(SYSTEM, lambda previous, transcript: None, store, token_budget=100_000, max_turns=1)
+    state = context.load("conversa")
+    image = {"role": "user", "content": [{"type": "image_ref", "image_ref": {"hash": "abc"}}]}
+    context.append(state, {"role": "user", "content": "o que você vê?"})
+    context.append(state, image)
+    assert image in context.window(state)
+
+    # A imagem sai da janela antes de o resumo tirá-la do histórico
+    context.append(state, {"role": "user", "content": "e agora?"})
+    assert image in state["history"]
+    assert context.window(state) == [{"role": "user", "content": "e agora?"}]
+    assert context.window(state) == context.build_messages("conversa", state)[1:]
@@ -0,0 +1,55 @@
+from image_store import ImageStore
+
+
+def test_caption_is_dropped_with_the_evicted_image():
+    store = ImageStore(max_bytes=250)
+    first = store.put(b"a" * 100)
+    store._keep_caption(first, "uma caneca azul")
+    assert store.caption(first) == "uma caneca azul"
+
+    store.put(b"b" * 100)
+    store.put(b"c" * 100)
+    assert first not in store
+    assert first not in store._captions
+    # Legenda que chega depois de a imagem sair também não fica
+    store._keep_caption(first, "tarde demais")
+    assert first not in store._captions
+
+
+class FakeTier:
+    def __init__(self):
+        self.images = {}
+        self.puts = 0
+
+    def get(self, image_hash):
+        return self.images.get(image_hash)
+
+    def put(self, image_hash, image_bytes):
+        self.puts += 1
+        self.images[image_hash] = image_bytes
+
+    def get_caption(self, image_hash):
+        return None
+
+    def put_caption(self, image_hash, caption):
+        pass
+
+
+def test_only_published_images_reach_the_shared_tier():
+    tier = FakeTier()
+    store = ImageStore(shared=tier)
+    frame = store.put(b"frame de uma rodada de texto")
+    assert tier.images == {}
+
+    attached = store.put(b"frame anexado ao historico")
+    store.publish(attached)
+    store.publish(attached)
+    assert tier.images == {attached: b"frame anexado ao historico"}
+    assert tier.puts == 1
+    assert frame not in tier.images
+
+    # Outro processo retomando a conversa busca a imagem no Redis
+    other = ImageStore(shared=tier)
+    assert other.get(attached) == b"frame anexado ao historico"
+    other.publish(attached)
+    assert tier.puts == 1
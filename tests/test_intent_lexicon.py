@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from intent_lexicon import IntentLexicon
+from intent_router import route_intent
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "intent_corpus.tsv")
+
+
+def load_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return [tuple(line.rstrip("\n").split("\t", 1)) for line in f if line.strip() and not line.startswith("#")]
+
+
+lexicon = IntentLexicon()
+
+
+@pytest.mark.parametrize("text", [text for label, text in load_corpus() if label == "vision"])
+def test_corpus_vision_sentences_allow_the_camera(text):
+    # Como o wants_image: sinal forte ou fraco de visão libera a câmera. Nas outras frases uma
+    # dica ("câmera", "imagem") também libera, mas só o ChatGPT decide usar (ver abaixo)
+    assert lexicon.match(text) & {"vision", "vision_hint"}
+
+
+def test_exact_terms_skip_the_stemmer():
+    custom = IntentLexicon({"vision": ["=olha", "câmera"]})
+    assert custom.match("Olha isso!") == {"vision"}
+    assert custom.match("dor no olho") == set()
+    assert custom.match("as câmeras") == {"vision"}
+
+
+@pytest.mark.parametrize("label,text", load_corpus())
+def test_corpus_fast_path_never_routes_wrong(label, text):
+    # O atalho só pode escolher a intenção do rótulo; na dúvida, None (decide o ChatGPT)
+    assert route_intent(text, lexicon.match(text)) in (None, label)
+
+
+def test_search_with_vision_hint_is_ambiguous():
+    text = "estou procurando minhas chaves, consegue ver onde estão?"
+    assert lexicon.match(text) == {"search", "vision_hint"}
+    assert route_intent(text, lexicon.match(text)) is None
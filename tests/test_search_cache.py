@@ -0,0 +1,95 @@
+import time
+import threading
+
+import pytest
+
+from search_cache import SearchCache
+
+
+class Interrupted(BaseException):
+    # Como o eventlet.Timeout e o GreenletExit: não herda de Exception
+    pass
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.01)
+
+
+def test_identical_queries_share_one_fetch():
+    cache = SearchCache()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "resultado"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("Clima hoje?", fetch)))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: cache.coalesced == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["resultado"] * 3
+    assert len(calls) == 1
+    assert cache.get_or_fetch("clima hoje", fetch) == "resultado"
+    assert cache.hits == 1
+
+
+def test_follower_takes_over_when_leader_is_interrupted():
+    cache = SearchCache()
+    release = threading.Event()
+
+    def interrupted_fetch():
+        release.wait(5)
+        raise Interrupted()
+
+    def leader():
+        with pytest.raises(Interrupted):
+            cache.get_or_fetch("cotação do dólar", interrupted_fetch)
+
+    results = []
+    leader_thread = threading.Thread(target=leader)
+    leader_thread.start()
+    wait_until(lambda: cache.misses == 1)
+    follower = threading.Thread(target=lambda: results.append(cache.get_or_fetch("cotação do dólar", lambda: "R$ 5")))
+    follower.start()
+    wait_until(lambda: cache.coalesced == 1)
+    release.set()
+    leader_thread.join()
+    follower.join()
+    assert results == ["R$ 5"]
+    assert cache.misses == 2
+
+
+def test_leader_error_reaches_followers():
+    cache = SearchCache()
+    release = threading.Event()
+
+    def failing_fetch():
+        release.wait(5)
+        raise RuntimeError("backend fora do ar")
+
+    errors = []
+
+    def search():
+        try:
+            cache.get_or_fetch("placar do jogo", failing_fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=search) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: cache.coalesced == 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["backend fora do ar"] * 2
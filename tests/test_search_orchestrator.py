@@ -0,0 +1,87 @@
+import time
+
+import eventlet
+from greenlet import GreenletExit
+
+from search_orchestrator import SearchOrchestrator
+
+
+class FakeBackend:
+    def __init__(self, delay=0.0, result=None, error=None):
+        self.delay = delay
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    def __call__(self, query):
+        self.calls += 1
+        try:
+            eventlet.sleep(self.delay)
+        except GreenletExit:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_primary_answers_without_hedge():
+    primary = FakeBackend(delay=0.01, result="primario")
+    backup = FakeBackend(result="reserva")
+    orchestrator = SearchOrchestrator([("primary", primary), ("backup", backup)], deadline=2, hedge_delay=0.5)
+    assert orchestrator.search("consulta") == "primario"
+    assert backup.calls == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary = FakeBackend(delay=5, result="primario")
+    backup = FakeBackend(delay=0.01, result="reserva")
+    orchestrator = SearchOrchestrator([("primary", primary), ("backup", backup)], deadline=2, hedge_delay=0.05)
+    start = time.perf_counter()
+    assert orchestrator.search("consulta") == "reserva"
+    assert time.perf_counter() - start < 1
+    eventlet.sleep(0)
+    assert primary.cancelled
+    # Perdeu a corrida, mas não é erro; o vencedor passa a ser o preferido
+    report = orchestrator.report()
+    assert report["primary"]["errors"] == 0
+    assert [name for name, _ in orchestrator.ranked_backends()] == ["backup", "primary"]
+
+
+def test_failure_tries_next_backend_without_waiting_for_hedge():
+    primary = FakeBackend(error=RuntimeError("fora do ar"))
+    backup = FakeBackend(result="reserva")
+    orchestrator = SearchOrchestrator([("primary", primary), ("backup", backup)], deadline=2, hedge_delay=1)
+    start = time.perf_counter()
+    assert orchestrator.search("consulta") == "reserva"
+    assert time.perf_counter() - start < 0.5
+    assert orchestrator.report()["primary"]["errors"] == 1
+    assert [name for name, _ in orchestrator.ranked_backends()] == ["backup", "primary"]
+
+
+def test_deadline_cancels_every_backend():
+    primary = FakeBackend(delay=5, result="primario")
+    backup = FakeBackend(delay=5, result="reserva")
+    orchestrator = SearchOrchestrator([("primary", primary), ("backup", backup)], deadline=0.2, hedge_delay=0.05)
+    start = time.perf_counter()
+    assert orchestrator.search("consulta") is None
+    assert time.perf_counter() - start < 1
+    eventlet.sleep(0)
+    assert primary.cancelled and backup.cancelled
+    report = orchestrator.report()
+    assert report["primary"]["errors"] == report["backup"]["errors"] == 1
+
+
+def test_untried_backend_ranks_after_measured_ones():
+    primary = FakeBackend(delay=0.01, result="primario")
+    backup = FakeBackend(result="reserva")
+    third = FakeBackend(result="terceiro")
+    orchestrator = SearchOrchestrator([("primary", primary), ("backup", backup), ("third", third)],
+                                      deadline=2, hedge_delay=0.5)
+    assert [name for name, _ in orchestrator.ranked_backends()] == ["primary", "backup", "third"]
+    assert orchestrator.search("consulta") == "primario"
+    # Com latência medida, o primário continua à frente; os não testados mantêm a ordem configurada
+    assert [name for name, _ in orchestrator.ranked_backends()] == ["primary", "backup", "third"]
+    assert orchestrator.search("outra consulta") == "primario"
+    assert backup.calls == third.calls == 0
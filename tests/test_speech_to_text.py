@@ -0,0 +1,68 @@
+import threading
+
+from speech_to_text import LiveTranscription
+
+
+class FakeSession:
+    def __init__(self):
+        self.chunks = []
+        self.aborted = False
+
+    def send(self, chunk):
+        self.chunks.append(chunk)
+
+    def finish(self):
+        return b"".join(self.chunks).decode()
+
+    def abort(self):
+        self.aborted = True
+
+
+def test_chunks_are_sent_in_order():
+    session = FakeSession()
+    live = LiveTranscription(session)
+    live.add_chunk(2, b"c")
+    live.add_chunk(0, b"a")
+    assert session.chunks == [b"a"]
+    live.add_chunk(1, b"b")
+    assert session.chunks == [b"a", b"b", b"c"]
+    assert live.finish(3) == "abc"
+
+
+def test_chunks_before_attach_are_kept():
+    # Trechos que chegam enquanto o backend ainda abre, inclusive o 0 (cabeçalho do WebM)
+    live = LiveTranscription()
+    live.add_chunk(1, b"b")
+    live.add_chunk(0, b"a")
+    session = FakeSession()
+    live.attach(session)
+    live.add_chunk(2, b"c")
+    assert live.finish(3) == "abc"
+
+
+def test_finish_waits_for_missing_chunks():
+    session = FakeSession()
+    live = LiveTranscription(session)
+    live.add_chunk(1, b"b")
+    sender = threading.Timer(0.05, live.add_chunk, args=(0, b"a"))
+    sender.start()
+    assert live.finish(2, timeout=5) == "ab"
+    sender.join()
+
+
+def test_finish_times_out_with_the_chunks_in_order():
+    live = LiveTranscription(FakeSession())
+    live.add_chunk(0, b"a")
+    live.add_chunk(2, b"c")
+    assert live.finish(3, timeout=0.05) == "a"
+
+
+def test_abort_before_attach_closes_the_new_session():
+    live = LiveTranscription()
+    live.add_chunk(0, b"a")
+    live.abort()
+    session = FakeSession()
+    live.attach(session)
+    assert session.aborted
+    assert session.chunks == []
+    assert live.finish(1, timeout=0.05) is None
@@ -0,0 +1,31 @@
+import os
+
+from tts_cache import DiskTier
+
+
+def test_disk_tier_tracks_size_and_evicts_in_batches(tmp_path, monkeypatch):
+    disk = DiskTier(directory=str(tmp_path), max_bytes=1000)
+    scans = []
+    scan = disk._scan
+    monkeypatch.setattr(disk, "_scan", lambda: scans.append(1) or scan())
+
+    for i in range(9):
+        disk.put(f"frase{i}", b"x" * 100)
+        os.utime(disk._path(f"frase{i}"), (i, i))  # ordem de uso conhecida
+    disk.put("frase0", b"y" * 100)  # regravar a mesma frase não conta duas vezes
+    assert disk._size == 900
+    assert scans == []
+
+    disk.put("frase9", b"x" * 100)
+    disk.put("frase10", b"x" * 100)
+    assert scans == [1]
+    # Desceu até 90% do limite, removendo os mais antigos
+    assert disk._size == 900
+    assert disk.get("frase1") is None and disk.get("frase2") is None
+    assert disk.get("frase0") == b"y" * 100
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) == 900
+
+
+def test_disk_tier_counts_existing_files_on_start(tmp_path):
+    (tmp_path / "antiga.mp3").write_bytes(b"x" * 300)
+    assert DiskTier(directory=str(tmp_path), max_bytes=1000)._size == 300
@@ -0,0 +1,24 @@
+import logging
+
+import pytest
+
+from turn_graph import TurnGraph
+
+
+def fail():
+    raise ValueError("frame inválido")
+
+
+def test_stage_error_is_logged_and_raised_by_result(caplog):
+    graph = TurnGraph()
+    graph.add("frame", fail)
+    graph.add("frame_encode", lambda frame: frame, deps=["frame"])
+    graph.add("transcribe", lambda: "texto")
+    with caplog.at_level(logging.ERROR, logger="turn_graph"):
+        assert graph.result("transcribe") == "texto"
+        with pytest.raises(ValueError):
+            graph.result("frame_encode")
+        with pytest.raises(ValueError):
+            graph.result("frame")
+    assert [record.getMessage() for record in caplog.records] == ["Erro na etapa frame: frame inválido"]
+    assert {"frame", "frame_encode", "transcribe"} <= set(graph.timings)
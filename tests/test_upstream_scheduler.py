@@ -0,0 +1,120 @@
+import time
+import threading
+
+import pytest
+
+from upstream_scheduler import (TTS, INTERACTIVE, BACKGROUND, RateLimited, TokenBucket, UpstreamLimiter,
+                                UpstreamScheduler, parse_duration, retry_after)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.01)
+
+
+def test_parse_duration():
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1h2m3.5s") == pytest.approx(3723.5)
+    assert parse_duration("2") == 2
+    assert parse_duration("") is None
+
+
+def test_retry_after_prefers_explicit_headers():
+    assert retry_after({"retry-after-ms": "250", "retry-after": "3"}) == 0.25
+    assert retry_after({"retry-after": "3"}) == 3
+    headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1s",
+               "x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "6s"}
+    assert retry_after(headers) == 6
+    assert retry_after({}) is None
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    bucket.take(60, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1) == 0
+    # Pedido maior que o balde espera ele encher, em vez de esperar para sempre
+    assert bucket.wait_time(600, now + 1) == pytest.approx(59.0)
+
+
+def test_token_bucket_without_limit_never_waits():
+    bucket = TokenBucket()
+    bucket.take(10_000, time.monotonic())
+    assert bucket.wait_time(10_000, time.monotonic()) == 0
+
+
+def test_token_bucket_follows_rate_limit_headers():
+    bucket = TokenBucket()
+    now = time.monotonic()
+    bucket.update(limit=100, remaining=10, reset=9, now=now)
+    assert bucket.capacity == 100
+    assert bucket.tokens == 10
+    assert bucket.rate == pytest.approx(10)
+    assert bucket.wait_time(20, now) == pytest.approx(1.0)
+    # Restante menor que o estimado localmente: vale o do provedor
+    bucket.update(limit=100, remaining=5, reset=9.5, now=now)
+    assert bucket.tokens == 5
+
+
+def test_limiter_serves_waiters_by_priority():
+    limiter = UpstreamLimiter("api")
+    limiter.pause(0.3)
+    served = []
+
+    def call(level, name):
+        limiter.acquire(0, level, time.monotonic() + 5)
+        served.append(name)
+
+    threads = []
+    for level, name in ((BACKGROUND, "resumo"), (INTERACTIVE, "chat 1"), (INTERACTIVE, "chat 2"), (TTS, "tts")):
+        thread = threading.Thread(target=call, args=(level, name))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: limiter.waiting == len(threads))
+    for thread in threads:
+        thread.join()
+    assert served == ["tts", "chat 1", "chat 2", "resumo"]
+    assert limiter.waiting == 0
+
+
+def test_limiter_spends_budget_only_for_the_head():
+    limiter = UpstreamLimiter("api", rpm=60, tpm=1000)
+    limiter.acquire(400, INTERACTIVE, time.monotonic() + 1)
+    limiter.acquire(400, INTERACTIVE, time.monotonic() + 1)
+    assert limiter.tokens.tokens == pytest.approx(200, abs=1)
+    # Faltam ~200 tokens a ~16/s: não cabe no prazo, desiste logo em vez de esperar à toa
+    start = time.monotonic()
+    with pytest.raises(RateLimited):
+        limiter.acquire(400, INTERACTIVE, time.monotonic() + 1)
+    assert time.monotonic() - start < 0.5
+    assert limiter.waiting == 0
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_call_retries_rate_limited_responses():
+    responses = [FakeResponse(429, {"retry-after-ms": "20"}), FakeResponse(503), FakeResponse(200)]
+    sent = list(responses)
+    scheduler = UpstreamScheduler(limits={}, max_retries=4, backoff=0.01, backoff_max=0.05, enabled=True)
+    response = scheduler.call(lambda: sent.pop(0), "api.example.com")
+    assert response is responses[2]
+    assert responses[0].closed and responses[1].closed
+
+
+def test_call_returns_last_error_after_max_retries():
+    scheduler = UpstreamScheduler(limits={}, max_retries=1, backoff=0.01, backoff_max=0.05, enabled=True)
+    response = scheduler.call(lambda: FakeResponse(500), "api.example.com")
+    assert response.status_code == 500
+    assert not response.closed
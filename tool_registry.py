@@ -0,0 +1,141 @@
+#registro das funções que o ChatGPT pode chamar: cada ferramenta é declarada uma vez, com o
+#esquema gerado da assinatura, e a lista enviada à API é montada uma só vez e nunca muda
+#(mesmos bytes em toda requisição, para o cache de prefixo do provedor funcionar).
+#As chamadas pedidas numa resposta rodam juntas, cada uma com seu prazo
+import os
+import time
+import inspect
+import json
+import logging
+
+import eventlet
+
+from metrics import CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))  # prazo padrão de cada função, em segundos
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+
+def _json_type(parameter):
+    if parameter.annotation in JSON_TYPES:
+        return JSON_TYPES[parameter.annotation]
+    if parameter.default is not inspect.Parameter.empty and type(parameter.default) in JSON_TYPES:
+        return JSON_TYPES[type(parameter.default)]
+    return "string"
+
+
+def function_schema(fn, name=None, description=None, params=None, exclude=()):
+    # Parâmetros sem valor padrão são obrigatórios; os excluídos (chaves de API...) ficam de fora
+    params = params or {}
+    properties = {}
+    required = []
+    for parameter in inspect.signature(fn).parameters.values():
+        if parameter.name in exclude or parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        prop = {"type": _json_type(parameter)}
+        if parameter.name in params:
+            prop["description"] = params[parameter.name]
+        properties[parameter.name] = prop
+        if parameter.default is inspect.Parameter.empty:
+            required.append(parameter.name)
+    return {
+        "type": "function",
+        "function": {
+            "name": name or fn.__name__,
+            "description": description or inspect.getdoc(fn) or "",
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": required,
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+class ToolRegistry:
+    def __init__(self):
+        self._tools = {}  # nome -> (função, esquema), na ordem de registro
+        self._timeouts = {}
+        self._schemas = None
+
+    def tool(self, description=None, name=None, exclude=(), timeout=TOOL_TIMEOUT, **params):
+        # Decorador: @tools.tool("descrição", parametro="descrição do parâmetro")
+        def register(fn):
+            tool_name = name or fn.__name__
+            if self._schemas is not None:
+                logger.warning(f"Ferramenta {tool_name} registrada depois do envio da lista ao ChatGPT.")
+                self._schemas = None
+            self._tools[tool_name] = (fn, function_schema(fn, tool_name, description, params, exclude))
+            self._timeouts[tool_name] = timeout
+            return fn
+        return register
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def schemas(self):
+        # Montada uma vez; a ida e volta pelo JSON garante uma cópia independente e estável
+        if self._schemas is None:
+            self._schemas = json.loads(json.dumps([schema for _, schema in self._tools.values()]))
+        return self._schemas
+
+    def _arguments(self, name, arguments):
+        # `arguments` é o JSON gerado pelo ChatGPT; argumentos desconhecidos são descartados
+        kwargs = json.loads(arguments or "{}") if isinstance(arguments, str) else dict(arguments or {})
+        allowed = self._tools[name][1]["function"]["parameters"]["properties"]
+        return {key: value for key, value in kwargs.items() if key in allowed}
+
+    def call(self, name, arguments):
+        return self._tools[name][0](**self._arguments(name, arguments))
+
+    def run(self, tool_call, handlers=None):
+        # Executa uma chamada e devolve a mensagem `tool` correspondente; erro e prazo
+        # estourado viram texto para o ChatGPT, sem derrubar as outras chamadas.
+        # `handlers` troca a implementação de uma função só nesta rodada (ex.: use_camera)
+        name = tool_call["function"]["name"]
+        start = time.perf_counter()
+        if name not in self._tools:
+            logger.warning(f"Função chamada não está disponível: {name}")
+            content = "Função não disponível."
+        else:
+            fn = (handlers or {}).get(name, self._tools[name][0])
+            try:
+                with eventlet.Timeout(self._timeouts[name]):
+                    result = fn(**self._arguments(name, tool_call["function"].get("arguments")))
+                if result is not None and not isinstance(result, str):
+                    result = json.dumps(result, ensure_ascii=False)
+                content = result or "Nenhum resultado encontrado."
+            except eventlet.Timeout:
+                logger.error(f"Função {name} excedeu o prazo de {self._timeouts[name]}s.")
+                content = "A função demorou demais para responder."
+            except Exception as e:
+                logger.error(f"Erro ao executar a função {name}: {e}")
+                content = "Erro ao executar a função."
+        elapsed = time.perf_counter() - start
+        CALL_SECONDS.observe(elapsed, call=name)
+        logger.info(f"Função {name} executada em {elapsed * 1000:.0f}ms.")
+        return {"role": "tool", "tool_call_id": tool_call["id"], "content": content}
+
+    def dispatch(self, tool_calls, handlers=None, on_cancel=None):
+        # Todas as chamadas ao mesmo tempo: a rodada espera só pela mais lenta.
+        # As respostas voltam na ordem das chamadas. `on_cancel` (ex.: TurnGraph.on_cancel)
+        # recebe a limpeza que para as chamadas em andamento se a rodada for cancelada
+        pool = eventlet.GreenPool(max(1, len(tool_calls)))
+        if on_cancel:
+            def kill_running():
+                for thread in list(pool.coroutines_running):
+                    thread.kill()
+            on_cancel(kill_running)
+        # GreenPile no próprio pool: o imap cria um pool à parte, que o kill_running não alcançaria
+        pile = eventlet.GreenPile(pool)
+        for tool_call in tool_calls:
+            pile.spawn(self.run, tool_call, handlers)
+        return list(pile)
+
+
+# Registro global: os módulos declaram suas ferramentas com @tools.tool(...)
+tools = ToolRegistry()
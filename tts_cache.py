@@ -0,0 +1,169 @@
+#cache do áudio sintetizado, endereçado por (modelo, voz, texto normalizado):
+#LRU em memória e uma camada em disco, ambos limitados em bytes
+import os
+import re
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import eventlet
+from eventlet import tpool
+from eventlet.patcher import original
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+TTS_CACHE_MAX_CHARS = int(os.getenv("TTS_CACHE_MAX_CHARS", "300"))  # respostas longas quase nunca se repetem
+EVICT_TARGET = 0.9  # o despejo do disco desce até esta fração do limite
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(model, voice, text):
+    return hashlib.sha256(f"{model}|{voice}|{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class DiskTier:
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Usado dentro do tpool: precisa ser um lock nativo, não o das green threads
+        self._lock = original("threading").Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Total em disco mantido a cada gravação; a pasta só é varrida na inicialização e
+        # quando o total passa do limite (aí o despejo desce até EVICT_TARGET do limite, para a
+        # próxima varredura demorar). A varredura também corrige o total com o que outros
+        # processos gravaram
+        self._size = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".mp3"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # removido por outro processo durante a varredura
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            os.utime(self._path(key))  # marca o uso para o despejo por antiguidade
+            return audio
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, audio):
+        # Nome temporário único: outro processo (ver serve.py) ou thread pode gravar a mesma frase
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(audio) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Chamado com o lock
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+
+class TTSCache:
+    def __init__(self, synthesize, model, voice, memory_bytes=TTS_CACHE_MEMORY_BYTES, disk=None):
+        self.synthesize = synthesize  # (texto) -> bytes de áudio ou None
+        self.model = model
+        self.voice = voice
+        self.memory_bytes = memory_bytes
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _remember(self, key, audio):
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = audio
+            self._size += len(audio)
+            while self._size > self.memory_bytes and self._memory:
+                _, old_audio = self._memory.popitem(last=False)
+                self._size -= len(old_audio)
+
+    def get(self, text):
+        key = cache_key(self.model, self.voice, text)
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                return audio
+        if self.disk is not None:
+            audio = tpool.execute(self.disk.get, key)
+            if audio is not None:
+                self._remember(key, audio)
+                return audio
+        return None
+
+    def text_to_speech(self, text):
+        # Só frases curtas entram no cache; acerto não vai à rede
+        if len(text) > TTS_CACHE_MAX_CHARS:
+            return self.synthesize(text)
+        audio = self.get(text)
+        if audio is not None:
+            self.hits += 1
+            return audio
+
+        self.misses += 1
+        audio = self.synthesize(text)
+        if audio:
+            key = cache_key(self.model, self.voice, text)
+            self._remember(key, audio)
+            if self.disk is not None:
+                eventlet.spawn_n(self._store_on_disk, key, audio)
+        return audio
+
+    def _store_on_disk(self, key, audio):
+        try:
+            tpool.execute(self.disk.put, key, audio)
+        except Exception as e:
+            logger.error(f"Erro ao gravar o áudio no cache em disco: {e}")
+
+    def prewarm(self, phrases):
+        # Sintetiza em segundo plano as frases mais comuns que ainda não estão no cache
+        def warm():
+            for phrase in phrases:
+                if self.get(phrase) is None:
+                    self.text_to_speech(phrase)
+            logger.info(f"Cache de TTS pré-aquecido com {len(phrases)} frases.")
+        eventlet.spawn_n(warm)
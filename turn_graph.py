@@ -0,0 +1,103 @@
+#executor das etapas de uma rodada como grafo de dependências em green threads:
+#etapas independentes (ex.: imagem e transcrição) rodam ao mesmo tempo
+import time
+import logging
+from contextlib import contextmanager
+
+import eventlet
+
+logger = logging.getLogger(__name__)
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+class TurnGraph:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.timings = {}  # etapa -> (início ms, fim ms), relativos ao início da rodada
+        self.deps = {}
+        self._threads = {}
+        self._on_cancel = []
+
+    def _now_ms(self):
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def elapsed_ms(self):
+        return self._now_ms()
+
+    def add(self, name, fn, deps=()):
+        # A etapa começa assim que as dependências terminam e recebe os resultados delas
+        self.deps[name] = list(deps)
+        self._threads[name] = eventlet.spawn(self._run, name, fn, list(deps))
+
+    def _run(self, name, fn, deps):
+        # A exceção fica guardada como resultado da etapa (sai do result()); se escapasse da
+        # green thread, o hub imprimiria o traceback no stderr, fora do logging
+        try:
+            args = [self.result(dep) for dep in deps]
+        except Exception as e:
+            # A dependência já registrou o erro; esta etapa falha junto, sem rodar
+            self.timings[name] = (self._now_ms(), self._now_ms())
+            return _Failed(e)
+        start = self._now_ms()
+        try:
+            return fn(*args)
+        except Exception as e:
+            logger.error(f"Erro na etapa {name}: {e}")
+            return _Failed(e)
+        finally:
+            self.timings[name] = (start, self._now_ms())
+
+    def has(self, name):
+        return name in self._threads
+
+    def result(self, name):
+        # Espera a etapa terminar; exceções da etapa são relançadas aqui
+        result = self._threads[name].wait()
+        if isinstance(result, _Failed):
+            raise result.error
+        return result
+
+    @contextmanager
+    def stage(self, name, deps=()):
+        # Etapa executada na própria green thread da rodada
+        self.deps[name] = list(deps)
+        start = self._now_ms()
+        try:
+            yield
+        finally:
+            self.timings[name] = (start, self._now_ms())
+
+    def on_cancel(self, fn):
+        # Limpeza extra quando a rodada é cancelada (ex.: parar a síntese de voz)
+        self._on_cancel.append(fn)
+
+    def cancel(self):
+        for thread in self._threads.values():
+            thread.kill()
+        for fn in self._on_cancel:
+            fn()
+
+    def critical_path(self):
+        # Volta da etapa que terminou por último pela dependência que terminou mais tarde
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while True:
+            deps = [dep for dep in self.deps.get(name, []) if dep in self.timings]
+            if not deps:
+                break
+            name = max(deps, key=lambda n: self.timings[n][1])
+            path.append(name)
+        return list(reversed(path))
+
+    def summary(self):
+        stages = ", ".join(
+            f"{name} {start:.0f}-{end:.0f}ms"
+            for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0])
+        )
+        return f"{stages} | caminho crítico: {' -> '.join(self.critical_path())}"
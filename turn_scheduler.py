@@ -0,0 +1,108 @@
+#agendamento das rodadas: cada sessão tem no máximo uma rodada ativa (uma mensagem nova
+#cancela a anterior, inclusive as requisições em andamento) e o servidor tem um limite de
+#rodadas simultâneas com uma fila curta; com a fila cheia o cliente recebe "ocupado" na hora
+import os
+import logging
+from contextlib import contextmanager
+
+import eventlet
+from eventlet.event import Event
+from eventlet.semaphore import Semaphore
+from greenlet import GreenletExit, getcurrent
+
+logger = logging.getLogger(__name__)
+
+TURN_MAX_ACTIVE = int(os.getenv("TURN_MAX_ACTIVE", "16"))  # rodadas simultâneas no servidor
+TURN_MAX_QUEUED = int(os.getenv("TURN_MAX_QUEUED", "32"))  # rodadas esperando uma vaga
+TURN_QUEUE_TIMEOUT = float(os.getenv("TURN_QUEUE_TIMEOUT", "5"))  # espera máxima na fila, em segundos
+CANCEL_TIMEOUT = 5  # espera máxima pelo fim de uma rodada cancelada
+
+
+class TurnCancelled(GreenletExit):
+    # Lançada na green thread da rodada substituída; por herdar de GreenletExit, passa
+    # pelos `except Exception` da rodada sem virar mensagem de erro para o cliente
+    pass
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class _Turn:
+    def __init__(self, owner):
+        self.owner = owner
+        self.greenlet = getcurrent()
+        self.done = Event()
+
+
+class TurnScheduler:
+    def __init__(self, max_active=TURN_MAX_ACTIVE, max_queued=TURN_MAX_QUEUED, queue_timeout=TURN_QUEUE_TIMEOUT):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._slots = Semaphore(max_active)
+        self._turns = {}  # chave -> rodadas ainda registradas (a última é a atual)
+        self.active = 0
+        self.queued = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    @contextmanager
+    def turn(self, key, owner=None):
+        # Envolve uma rodada: cancela as anteriores com a mesma chave (a conversa, que pode estar
+        # aberta em mais de uma aba) e espera uma vaga. `owner` é quem pediu (o sid), para cancel.
+        # Lança ServerBusy se não houver vaga, e TurnCancelled se uma mensagem mais nova chegar
+        turn = _Turn(owner)
+        turns = self._turns.setdefault(key, [])
+        previous = list(turns)
+        turns.append(turn)
+        admitted = False
+        try:
+            self._cancel(previous)
+            self._admit()
+            admitted = True
+            self.active += 1
+            yield
+        finally:
+            if admitted:
+                self.active -= 1
+                self._slots.release()
+            turns = self._turns.get(key)
+            if turns and turn in turns:
+                turns.remove(turn)
+                if not turns:
+                    del self._turns[key]
+            turn.done.send()
+
+    def cancel(self, key, owner=None):
+        # Cancela as rodadas da chave (só as de `owner`, se dado; ex.: desconexão de uma aba)
+        # e espera que terminem
+        self._cancel([turn for turn in self._turns.get(key, ()) if owner is None or turn.owner == owner])
+
+    def _cancel(self, turns):
+        # Espera o fim de cada rodada cancelada: ela ainda grava o estado da sessão ao sair,
+        # e a rodada nova só deve lê-lo depois disso
+        pending = [turn for turn in turns if not turn.done.ready()]
+        for turn in pending:
+            self.cancelled += 1
+            eventlet.kill(turn.greenlet, TurnCancelled())
+        for turn in pending:
+            with eventlet.Timeout(CANCEL_TIMEOUT, False):
+                turn.done.wait()
+            if not turn.done.ready():
+                logger.warning("Rodada cancelada não terminou no prazo.")
+
+    def _admit(self):
+        if self._slots.acquire(blocking=False):
+            return
+        if self.queued >= self.max_queued:
+            self.rejected += 1
+            raise ServerBusy()
+        self.queued += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            self.queued -= 1
+        if not acquired:
+            self.rejected += 1
+            raise ServerBusy()
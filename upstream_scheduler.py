@@ -0,0 +1,316 @@
+#agendador das chamadas às APIs externas: orçamento de requisições e de tokens por chave de
+#API (e modelo) em baldes de fichas, ajustados pelos cabeçalhos x-ratelimit-* de cada
+#resposta. Quem espera por orçamento é atendido por prioridade (TTS antes do chat, chat antes
+#de resumos e legendas) e 429/5xx são repetidos com espera aleatória crescente dentro do prazo
+import os
+import re
+import json
+import time
+import heapq
+import random
+import hashlib
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import eventlet
+
+from metrics import UPSTREAM_WAIT_SECONDS, UPSTREAM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Prioridades: número menor é atendido primeiro
+TTS, INTERACTIVE, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {TTS: "tts", INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+UPSTREAM_SCHEDULER = os.getenv("UPSTREAM_SCHEDULER", "1") == "1"  # 0: chamada direta, sem orçamento nem retentativa
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "20"))  # fila + retentativas de uma chamada interativa (s)
+UPSTREAM_BACKGROUND_DEADLINE = float(os.getenv("UPSTREAM_BACKGROUND_DEADLINE", "120"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "4"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.5"))  # espera base antes da 1ª retentativa (s)
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+# Limites conhecidos antes da primeira resposta (ex.: Deepgram, que não manda cabeçalhos):
+# {"api.deepgram.com": {"rpm": 600}, "api.openai.com": {"rpm": 500, "tpm": 200000}}
+UPSTREAM_LIMITS = json.loads(os.getenv("UPSTREAM_LIMITS") or "{}")
+
+COMPLETION_TOKENS = int(os.getenv("UPSTREAM_COMPLETION_TOKENS", "300"))  # resposta estimada sem max_tokens
+IMAGE_TOKENS = 765  # imagem em alta resolução, ~4 blocos de 512px
+RETRY_STATUS = {429, 500, 502, 503, 504}
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+_priority = ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+class RateLimited(Exception):
+    pass
+
+
+@contextmanager
+def priority(level):
+    # As chamadas feitas dentro do bloco (na mesma green thread) usam esta prioridade
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def parse_duration(value):
+    # Formato dos cabeçalhos da OpenAI: "20ms", "1s", "6m0s", "1h2m3.5s"
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def retry_after(headers):
+    # Quanto o provedor pede para esperar: retry-after(-ms) ou o reset do balde que zerou
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    try:
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # data HTTP: cai nos cabeçalhos x-ratelimit
+    waits = [parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+             for kind in ("requests", "tokens") if headers.get(f"x-ratelimit-remaining-{kind}") == "0"]
+    waits = [wait for wait in waits if wait]
+    return max(waits) if waits else None
+
+
+def estimate_tokens(payload):
+    # Como a OpenAI desconta o limite de tokens: a entrada estimada (~4 caracteres por token)
+    # mais o máximo pedido para a resposta
+    chars = 0
+    images = 0
+    for message in payload.get("messages") or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "image_url":
+                    images += 1
+                else:
+                    chars += len(part.get("text") or "")
+    if payload.get("tools"):
+        chars += len(json.dumps(payload["tools"]))
+    completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or COMPLETION_TOKENS
+    return chars // 4 + images * IMAGE_TOKENS + completion
+
+
+def request_cost(body):
+    # (modelo, tokens) de uma requisição JSON; o modelo separa os limites na OpenAI
+    if not body:
+        return None, 0
+    payload = body
+    if isinstance(body, (bytes, str)):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None, 0
+    if not isinstance(payload, dict):
+        return None, 0
+    tokens = estimate_tokens(payload) if "messages" in payload else 0
+    return payload.get("model"), tokens
+
+
+class TokenBucket:
+    # Sem limite conhecido (capacity None) não segura ninguém
+    def __init__(self, per_minute=None):
+        self.capacity = None
+        self.rate = None  # fichas por segundo
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        if per_minute:
+            self.capacity = self.tokens = float(per_minute)
+            self.rate = per_minute / 60
+
+    def _refill(self, now):
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        if self.capacity is None or not amount:
+            return 0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # pedido maior que o balde: espera ele encher
+        return 0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount, now):
+        if self.capacity is not None:
+            self._refill(now)
+            self.tokens -= amount
+
+    def update(self, limit, remaining, reset, now):
+        # `reset` é o tempo até o balde do provedor encher de novo: dá a taxa de reposição
+        known = self.capacity is not None
+        self._refill(now)
+        self.capacity = limit
+        if reset and remaining < limit:
+            self.rate = (limit - remaining) / reset
+        elif self.rate is None:
+            self.rate = limit / 60  # limites por minuto
+        self.tokens = min(self.tokens, remaining) if known else remaining
+
+
+class _Waiter:
+    def __init__(self, priority, seq):
+        self.key = (priority, seq)
+        self.wake = threading.Event()
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class UpstreamLimiter:
+    def __init__(self, name, rpm=None, tpm=None):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0  # depois de um 429, ninguém chama até aqui
+        self._queue = []  # quem espera orçamento, por (prioridade, chegada)
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self):
+        return len(self._queue)
+
+    def _wait_time(self, cost, now):
+        return max(self.paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(cost, now))
+
+    def acquire(self, cost, priority, deadline):
+        # Só o primeiro da fila desconta do orçamento; os outros esperam a vez dele passar
+        waiter = _Waiter(priority, next(self._seq))
+        heapq.heappush(self._queue, waiter)
+        try:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(cost, now) if self._queue[0] is waiter else None
+                if wait is not None and wait <= 0:
+                    self.requests.take(1, now)
+                    self.tokens.take(cost, now)
+                    return
+                remaining = deadline - now
+                if remaining <= 0 or (wait is not None and wait > remaining):
+                    raise RateLimited(f"Limite de {self.name} não libera a chamada dentro do prazo.")
+                waiter.wake.clear()
+                waiter.wake.wait(remaining if wait is None else wait)
+        finally:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+            if self._queue:
+                self._queue[0].wake.set()
+
+    def update(self, headers):
+        now = time.monotonic()
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if limit and remaining:
+                try:
+                    bucket.update(float(limit), float(remaining),
+                                  parse_duration(headers.get(f"x-ratelimit-reset-{kind}")), now)
+                except ValueError:
+                    pass
+        if self._queue:
+            self._queue[0].wake.set()
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class UpstreamScheduler:
+    def __init__(self, limits=UPSTREAM_LIMITS, max_retries=UPSTREAM_MAX_RETRIES,
+                 backoff=UPSTREAM_BACKOFF, backoff_max=UPSTREAM_BACKOFF_MAX, enabled=UPSTREAM_SCHEDULER):
+        self.limits = limits
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.enabled = enabled
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, host, credential=None, model=None):
+        # Um orçamento por chave de API e modelo; a chave entra só como hash
+        key = (host, hashlib.sha256(credential.encode()).hexdigest()[:8] if credential else None, model)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limits = self.limits.get(host, {})
+                name = f"{host}/{model}" if model else host
+                limiter = self._limiters[key] = UpstreamLimiter(name, limits.get("rpm"), limits.get("tpm"))
+        return limiter
+
+    def _delay(self, attempt, hint):
+        # Espera aleatória entre zero e o dobro da anterior ("full jitter"); se o provedor
+        # disse quanto esperar, espera isso mais um pouco, para as retentativas não chegarem juntas
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+        return hint + random.uniform(0, self.backoff) if hint else delay
+
+    def call(self, send, host, credential=None, model=None, cost=0, retry_on=()):
+        # `send()` faz a requisição e devolve uma resposta com status_code, headers e close()
+        # (requests ou httpx); a última resposta com erro é devolvida para quem chamou tratar
+        if not self.enabled:
+            return send()
+        level = _priority.get()
+        deadline = time.monotonic() + (UPSTREAM_BACKGROUND_DEADLINE if level == BACKGROUND else UPSTREAM_DEADLINE)
+        limiter = self.limiter(host, credential, model)
+        for attempt in itertools.count():
+            start = time.monotonic()
+            limiter.acquire(cost, level, deadline)
+            UPSTREAM_WAIT_SECONDS.observe(time.monotonic() - start, upstream=limiter.name,
+                                          priority=PRIORITY_NAMES[level])
+            try:
+                response = send()
+            except retry_on as e:
+                if attempt >= self.max_retries:
+                    raise
+                error, response, status, hint = e, None, "connection", None
+            else:
+                limiter.update(response.headers)
+                status = response.status_code
+                if status not in RETRY_STATUS or attempt >= self.max_retries:
+                    return response
+                hint = retry_after(response.headers)
+            delay = self._delay(attempt, hint)
+            if status == 429:
+                limiter.pause(delay)
+            if time.monotonic() + delay >= deadline:
+                if response is None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            UPSTREAM_RETRIES.inc(upstream=limiter.name, status=str(status))
+            logger.warning(f"{limiter.name} respondeu {status}; nova tentativa em {delay:.2f}s.")
+            eventlet.sleep(delay)
+
+    def report(self):
+        # Orçamento restante e fila de cada limite, para as métricas
+        with self._lock:
+            limiters = list(self._limiters.values())
+        now = time.monotonic()
+        report = {}
+        for limiter in limiters:
+            for bucket in (limiter.requests, limiter.tokens):
+                bucket._refill(now)
+            report[limiter.name] = {
+                "requests": limiter.requests.tokens if limiter.requests.capacity is not None else None,
+                "tokens": limiter.tokens.tokens if limiter.tokens.capacity is not None else None,
+                "waiting": limiter.waiting,
+            }
+        return report
+
+
+# Agendador global, usado pelo http_client (requests e httpx)
+scheduler = UpstreamScheduler()